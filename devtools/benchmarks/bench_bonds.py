@@ -0,0 +1,64 @@
+"""
+Time the batched bond cylinder placement against the original per-bond loop.
+
+Usage:
+    python devtools/benchmarks/bench_bonds.py [--bonds 10000] [--sides 16]
+
+Bonds join random carbon and oxygen atoms. The loop rotates each cylinder 
+with shapes.rotation_matrix and R.dot(cyl.T).T as get_bonds used to, the 
+batched engine places all of them with one einsum in get_bond_cylinders.
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from moly.layers.bonds import get_bond_cylinders
+from moly.molecule.shapes import get_cylinder_template, rotation_matrix
+
+
+def loop_cylinders(geometry, symbols, bonds, radius, template):
+    cylinders = []
+    for idx1, idx2 in bonds:
+        vec1 = geometry[idx1]
+        vec2 = geometry[idx2]
+        length = np.linalg.norm(vec2-vec1)
+        R = rotation_matrix(np.array([0,0,1]), vec2 - vec1)
+        if symbols[idx1] == symbols[idx2]:
+            cyl = template * [radius, radius, length]
+            cylinders.append(R.dot(cyl.T).T + vec1)
+        else:
+            cyl = R.dot((template * [radius, radius, length / 2]).T).T
+            cylinders += [cyl + vec1, cyl + (vec1+vec2)/2]
+    return np.stack(cylinders)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bonds", type=int, default=10000, help="Number of bonds")
+    parser.add_argument("--sides", type=int, default=16, help="Sides of the cylinders")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    natoms = args.bonds + 1
+    geometry = rng.normal(scale=10.0, size=(natoms, 3))
+    symbols = rng.choice(["C", "O"], natoms)
+    bonds = [(i, i + 1) for i in range(args.bonds)]
+    template, _ = get_cylinder_template(args.sides)
+
+    start = time.perf_counter()
+    looped = loop_cylinders(geometry, symbols, bonds, 0.3, template)
+    loop_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batched, _ = get_bond_cylinders(geometry, symbols, bonds, 0.3, template)
+    batch_time = time.perf_counter() - start
+
+    assert np.allclose(looped, batched)
+    print(f"{args.bonds} bonds, {len(batched)} cylinders of {len(template)} vertices: "
+          f"loop {loop_time:6.3f} s | batched {batch_time:6.3f} s | {loop_time / batch_time:5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""
+Benchmark parsing compressed cube files against the uncompressed file.
+
+Usage:
+    python devtools/benchmarks/bench_compressed_cubes.py [--size 150]
+
+Writes a synthetic cube of ``size**3`` voxels, compresses it with gzip,
+bzip2 and xz, and reports file size and parse throughput of cube_to_array.
+"""
+
+import argparse
+import bz2
+import gzip
+import lzma
+import os
+import shutil
+import tempfile
+
+from bench_cube_parser import write_synthetic_cube, timeit
+from moly.layers.cube import cube_to_array
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=150, help="Points per axis of the synthetic cube")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        plain = os.path.join(tmp, "synthetic.cube")
+        write_synthetic_cube(plain, args.size)
+        plain_size = os.path.getsize(plain)
+
+        files = [("plain", plain)]
+        for extension, compressor in [(".gz", gzip), (".bz2", bz2), (".xz", lzma)]:
+            compressed = plain + extension
+            with open(plain, "rb") as f, compressor.open(compressed, "wb") as out:
+                shutil.copyfileobj(f, out)
+            files.append((extension, compressed))
+
+        for label, path in files:
+            size = os.path.getsize(path)
+            elapsed = timeit(cube_to_array, path)
+            print(f"{label:>6}: {size / 2**20:8.1f} MB on disk ({plain_size / size:4.1f}x) | "
+                  f"{elapsed:7.3f} s | {plain_size / 2**20 / elapsed:7.1f} MB/s of cube text")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Benchmark the Mesh3d isosurface engine against plotly's Isosurface trace.
+
+Usage:
+    python devtools/benchmarks/bench_cube_mesh.py [--size 150]
+
+Builds one isovalue of ``moly/tests/Da.cube`` and of a synthetic p-like
+orbital of ``size**3`` voxels with both engines, and reports the numbers
+sent to the browser, the length of ``fig.to_json()`` and the build time.
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+import plotly.graph_objects as go
+
+from moly.layers.cube import cube_to_array, get_cube_trace
+from moly.layers.isosurface import get_cube_mesh
+
+TESTS = os.path.join(os.path.dirname(__file__), "..", "..", "moly", "tests")
+
+
+def p_orbital(n):
+    x, y, z = np.ogrid[-6:6:n * 1j, -6:6:n * 1j, -6:6:n * 1j]
+    return z * np.exp(-np.sqrt(x**2 + y**2 + z**2) / 2), 12 / (n - 1)
+
+
+def numbers(trace):
+    return sum(np.asarray(getattr(trace, key)).size for key in ("x", "y", "z", "value", "i", "j", "k", "intensity")
+               if getattr(trace, key, None) is not None)
+
+
+def measure(label, cube, spacing, origin, iso):
+    for engine, build in [("isosurface", get_cube_trace), ("mesh", get_cube_mesh)]:
+        start = time.perf_counter()
+        trace, _, _ = build(cube, spacing, origin, iso, "portland", 0.3)
+        built = time.perf_counter() - start
+        payload = len(go.Figure(trace).to_json())
+        print(f"{label:>18} {engine:>10}: {numbers(trace):10d} numbers | json {payload / 2**20:8.2f} MB | "
+              f"build {built:6.3f} s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=150, help="Points per axis of the synthetic orbital")
+    args = parser.parse_args()
+
+    cube, meta = cube_to_array(os.path.join(TESTS, "Da.cube"))
+    measure("Da.cube", cube, [0.5, 0.5, 0.5], meta["origin"], 0.01)
+
+    orbital, h = p_orbital(args.size)
+    measure(f"p orbital {args.size}^3", orbital, [h, h, h], [-6, -6, -6], 0.05)
+
+
+if __name__ == "__main__":
+    main()
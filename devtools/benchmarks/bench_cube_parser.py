@@ -0,0 +1,91 @@
+"""
+Benchmark the bulk cube parser against the original per-token loop.
+
+Usage:
+    python devtools/benchmarks/bench_cube_parser.py [--size 200]
+
+Parses ``moly/tests/Da.cube`` and a synthetic cube of ``size**3`` voxels
+written to a temporary directory.
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from moly.layers.cube import cube_to_array, _getline
+
+TESTS = os.path.join(os.path.dirname(__file__), "..", "..", "moly", "tests")
+
+
+def legacy_cube_to_array(file):
+    """Per-token parser shipped before the bulk reader"""
+    cube_details = {}
+    with open(file, 'r') as cube:
+        cube.readline()
+        cube.readline()
+        natm, cube_details['origin'] = _getline(cube)
+        nx, cube_details['xvec'] = _getline(cube)
+        ny, cube_details['yvec'] = _getline(cube)
+        nz, cube_details['zvec'] = _getline(cube)
+        cube_details['geometry'] = [_getline(cube) for i in range(natm)]
+        data = np.zeros((nx * ny * nz))
+        idx = 0
+        for line in cube:
+            for val in line.strip().split():
+                data[idx] = float(val)
+                idx += 1
+    return np.reshape(data, (nx, ny, nz)), cube_details
+
+
+def write_synthetic_cube(path, n):
+    """Write an ``n**3`` cube holding a gaussian blob around a water molecule"""
+    x, y, z = np.ogrid[-1:1:n * 1j, -1:1:n * 1j, -1:1:n * 1j]
+    values = np.exp(-8 * (x**2 + y**2 + z**2)).ravel()
+    with open(path, "w") as f:
+        f.write("Synthetic cube\nBenchmark volume\n")
+        f.write(f"{3:5d} {-5.0:11.6f} {-5.0:11.6f} {-5.0:11.6f}\n")
+        for _ in range(3):
+            f.write(f"{n:5d} {10 / n:11.6f} {0.0:11.6f} {0.0:11.6f}\n")
+        f.write("    1   0.000000   1.416101   0.000000   1.020005\n")
+        f.write("    8   0.000000   0.000000   0.000000  -0.128539\n")
+        f.write("    1   0.000000  -1.416101   0.000000   1.020005\n")
+        full = values.size - values.size % 6
+        np.savetxt(f, values[:full].reshape(-1, 6), fmt="%13.5E", delimiter="")
+        if full != values.size:
+            np.savetxt(f, values[full:].reshape(1, -1), fmt="%13.5E", delimiter="")
+
+
+def timeit(func, *args, repeat=3):
+    best = np.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=200, help="Points per axis of the synthetic cube")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        synthetic = os.path.join(tmp, "synthetic.cube")
+        write_synthetic_cube(synthetic, args.size)
+
+        for label, path in [("Da.cube", os.path.join(TESTS, "Da.cube")),
+                            (f"synthetic {args.size}^3", synthetic)]:
+            new, _ = cube_to_array(path)
+            old, _ = legacy_cube_to_array(path)
+            assert np.array_equal(new, old)
+
+            t_old = timeit(legacy_cube_to_array, path, repeat=1)
+            t_new = timeit(cube_to_array, path)
+            print(f"{label:>20}: legacy {t_old:8.3f} s | bulk {t_new:8.3f} s | speedup {t_old / t_new:6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Measure memory and serialized size of figures built in float64 and float32.
+
+Usage:
+    python devtools/benchmarks/bench_dtype.py [--atoms 200]
+
+Builds add_cube figures from ``moly/tests/Da.cube`` and add_molecule figures
+of a random carbon cluster, and reports the bytes held by the trace arrays
+and the length of ``fig.to_json()``.
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+
+import moly
+
+TESTS = os.path.join(os.path.dirname(__file__), "..", "..", "moly", "tests")
+
+
+def random_cluster(natoms, seed=0):
+    """Carbon atoms on a jittered cubic lattice, 2.8 bohr apart"""
+    rng = np.random.default_rng(seed)
+    side = int(np.ceil(natoms ** (1 / 3)))
+    grid = np.stack(np.meshgrid(*[np.arange(side)] * 3, indexing="ij"), -1).reshape(-1, 3)[:natoms]
+    geometry = grid * 2.8 + rng.normal(scale=0.05, size=(natoms, 3))
+    return moly.Molecule(symbols=["C"] * natoms, geometry=geometry)
+
+
+def array_bytes(fig):
+    total = 0
+    for trace in fig.fig.data:
+        for key in ("x", "y", "z", "value", "i", "j", "k"):
+            value = getattr(trace, key, None)
+            if isinstance(value, np.ndarray):
+                total += value.nbytes
+    return total
+
+
+def measure(label, build):
+    for dtype in (np.float64, np.float32):
+        fig = moly.Figure(dtype=dtype)
+        start = time.perf_counter()
+        build(fig)
+        built = time.perf_counter() - start
+        start = time.perf_counter()
+        payload = len(fig.fig.to_json())
+        encoded = time.perf_counter() - start
+        print(f"{label:>22} {np.dtype(dtype).name:>8}: arrays {array_bytes(fig) / 2**20:8.2f} MB | "
+              f"json {payload / 2**20:8.2f} MB | build {built:6.2f} s | to_json {encoded:6.2f} s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--atoms", type=int, default=200, help="Atoms in the synthetic cluster")
+    args = parser.parse_args()
+
+    da_cube = os.path.join(TESTS, "Da.cube")
+    molecule = random_cluster(args.atoms)
+    measure("Da.cube", lambda fig: fig.add_cube(da_cube, iso=0.03))
+    measure("Da.cube slider x5", lambda fig: fig.add_cube(da_cube, iso=[0.01, 0.02, 0.03, 0.04, 0.05]))
+    measure(f"C{args.atoms} cluster", lambda fig: fig.add_molecule("cluster", molecule))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Measure serialized size and encode time of figures with and without compact export.
+
+Usage:
+    python devtools/benchmarks/bench_export.py [--atoms 2000] [--precision 3]
+
+Serializes add_cube figures of the test cubes and an add_molecule figure of a 
+random carbon cluster three ways: arrays as JSON number lists (plotly < 6), 
+plotly's own ``fig.to_json()`` and ``compact_figure``, with and without 
+rounding. Sizes are also given after gzip, as served over HTTP.
+"""
+
+import argparse
+import gzip
+import json
+import os
+import time
+
+import plotly.io as pio
+from plotly.utils import PlotlyJSONEncoder
+
+import moly
+from moly.figure.export import compact_figure, decode_array
+
+from bench_dtype import random_cluster
+
+TESTS = os.path.join(os.path.dirname(__file__), "..", "..", "moly", "tests")
+
+
+def as_lists(value):
+    if isinstance(value, dict) and "bdata" in value:
+        return decode_array(value).tolist()
+    if isinstance(value, dict):
+        return {key: as_lists(item) for key, item in value.items()}
+    return value
+
+
+def encoders(precision):
+    return [("json lists", lambda fig: json.dumps(as_lists(fig.to_plotly_json()), cls=PlotlyJSONEncoder)),
+            ("to_json", lambda fig: fig.to_json()),
+            ("compact", lambda fig: pio.to_json(compact_figure(fig), validate=False)),
+            (f"compact {precision} dec", lambda fig: pio.to_json(compact_figure(fig, precision), validate=False))]
+
+
+def measure(label, build, precision):
+    fig = moly.Figure()
+    build(fig)
+    for name, encode in encoders(precision):
+        start = time.perf_counter()
+        payload = encode(fig.fig).encode()
+        encoded = time.perf_counter() - start
+        print(f"{label:>18} {name:>14}: {len(payload) / 2**20:8.2f} MB | "
+              f"gzip {len(gzip.compress(payload, 6)) / 2**20:8.2f} MB | encode {encoded:6.2f} s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--atoms", type=int, default=2000, help="Atoms in the synthetic cluster")
+    parser.add_argument("--precision", type=int, default=3, help="Decimals kept by the rounded export")
+    args = parser.parse_args()
+
+    da_cube = os.path.join(TESTS, "Da.cube")
+    dt_cube = os.path.join(TESTS, "Dt.cube")
+    molecule = random_cluster(args.atoms)
+    measure("Da.cube", lambda fig: fig.add_cube(da_cube, iso=0.03), args.precision)
+    measure("Dt.cube", lambda fig: fig.add_cube(dt_cube, iso=0.03), args.precision)
+    measure(f"C{args.atoms} cluster", lambda fig: fig.add_molecule("cluster", molecule), args.precision)
+
+
+if __name__ == "__main__":
+    main()
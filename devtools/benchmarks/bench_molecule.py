@@ -0,0 +1,52 @@
+"""
+Measure add_molecule build time, trace count and payload for merged and per-atom traces.
+
+Usage:
+    python devtools/benchmarks/bench_molecule.py [--atoms 10 100 1000 10000] [--max-traces 1000]
+
+Builds add_molecule figures of random carbon clusters with merge=True and 
+merge=False. Per-atom figures are only built up to --max-traces atoms.
+Connectivity is guessed once beforehand and is not part of the timings.
+"""
+
+import argparse
+import time
+
+import qcelemental as qcel
+
+import moly
+
+from bench_dtype import random_cluster
+
+
+def measure(molecule, merge):
+    bonds = qcel.molutil.guess_connectivity(molecule.symbols, molecule.geometry)
+    fig = moly.Figure()
+    fig.get_connectivity = lambda molecule: bonds
+    start = time.perf_counter()
+    fig.add_molecule("cluster", molecule, merge=merge)
+    built = time.perf_counter() - start
+    start = time.perf_counter()
+    payload = len(fig.fig.to_json())
+    encoded = time.perf_counter() - start
+    return len(bonds), len(fig.fig.data), built, payload, encoded
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--atoms", type=int, nargs="+", default=[10, 100, 1000, 10000], help="Cluster sizes")
+    parser.add_argument("--max-traces", type=int, default=1000, help="Largest cluster built with merge=False")
+    args = parser.parse_args()
+
+    for natoms in args.atoms:
+        molecule = random_cluster(natoms)
+        for merge in (False, True):
+            if merge is False and natoms > args.max_traces:
+                continue
+            nbonds, traces, built, payload, encoded = measure(molecule, merge)
+            print(f"{natoms:>6} atoms {nbonds:>6} bonds merge={str(merge):>5}: {traces:>6} traces | "
+                  f"build {built:7.2f} s | json {payload / 2**20:8.2f} MB | to_json {encoded:6.2f} s")
+
+
+if __name__ == "__main__":
+    main()
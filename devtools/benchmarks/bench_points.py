@@ -0,0 +1,47 @@
+"""
+Measure add_molecule on large systems with style="points" against merged meshes.
+
+Usage:
+    python devtools/benchmarks/bench_points.py [--atoms 50000 200000] [--max-mesh 50000]
+
+Builds random carbon clusters as markers, markers with bond lines and merged
+low quality meshes (only up to --max-mesh atoms), and reports build time, 
+including guessing the bonds, and the length of ``fig.to_json()``.
+"""
+
+import argparse
+import time
+
+import moly
+
+from bench_dtype import random_cluster
+
+
+def measure(label, molecule, **kwargs):
+    fig = moly.Figure()
+    start = time.perf_counter()
+    fig.add_molecule("cluster", molecule, **kwargs)
+    built = time.perf_counter() - start
+    start = time.perf_counter()
+    payload = len(fig.fig.to_json())
+    encoded = time.perf_counter() - start
+    print(f"{len(molecule.symbols):>7} atoms {label:>14}: build {built:6.2f} s | "
+          f"json {payload / 2**20:8.2f} MB | to_json {encoded:6.2f} s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--atoms", type=int, nargs="+", default=[50000, 200000], help="Cluster sizes")
+    parser.add_argument("--max-mesh", type=int, default=50000, help="Largest cluster built as meshes")
+    args = parser.parse_args()
+
+    for natoms in args.atoms:
+        molecule = random_cluster(natoms)
+        measure("points", molecule, style="points")
+        measure("points + bonds", molecule, style="points", point_bonds=True)
+        if natoms <= args.max_mesh:
+            measure("mesh low", molecule, quality="low", max_atoms=natoms)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+Measure the line based wireframe style against wireframes built from meshes.
+
+Usage:
+    python devtools/benchmarks/bench_wireframe.py [--atoms 100 1000 10000] [--max-traces 1000]
+
+The previous wireframe style drew thin cylinders and spheres, which costs the 
+same as style="tubes" with the same quality, so tubes stand in for it: as one
+trace per atom and bond (only up to --max-traces atoms) and as merged meshes.
+Bonds are guessed once beforehand and are not part of the timings.
+"""
+
+import argparse
+import time
+
+import moly
+from moly.molecule.connectivity import guess_connectivity
+
+from bench_dtype import random_cluster
+
+
+def measure(label, molecule, bonds, **kwargs):
+    fig = moly.Figure(quality="medium")
+    fig.get_connectivity = lambda molecule: bonds
+    start = time.perf_counter()
+    fig.add_molecule("cluster", molecule, **kwargs)
+    built = time.perf_counter() - start
+    payload = len(fig.fig.to_json())
+    print(f"{len(molecule.symbols):>6} atoms {label:>16}: {len(fig.fig.data):>6} traces | "
+          f"build {built:7.3f} s | json {payload / 2**20:8.2f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--atoms", type=int, nargs="+", default=[100, 1000, 10000], help="Cluster sizes")
+    parser.add_argument("--max-traces", type=int, default=1000, help="Largest cluster built with one trace per atom")
+    args = parser.parse_args()
+
+    for natoms in args.atoms:
+        molecule = random_cluster(natoms)
+        bonds = guess_connectivity(molecule.symbols, molecule.geometry)
+        if natoms <= args.max_traces:
+            measure("meshes per atom", molecule, bonds, style="tubes", merge=False)
+        measure("merged meshes", molecule, bonds, style="tubes")
+        measure("lines", molecule, bonds, style="wireframe")
+
+
+if __name__ == "__main__":
+    main()
@@ -34,6 +34,8 @@
 import numpy as np
 import psi4
 
+from ..layers.cube import get_isocontour_range
+
 
 def build_grid(wfn, L, D):
     """
@@ -232,7 +234,7 @@ def add_density(npoints, points, block, matrix):
 
 
 
-def compute_isocontour_range(v, npoints):
+def compute_isocontour_range(v, npoints, cumulative_threshold=0.85):
     """
     Computes threshold for isocontour range
 
@@ -245,6 +247,9 @@ def compute_isocontour_range(v, npoints):
     npopints : int
         Total number of points on the grid
 
+    cumulative_threshold : float
+        Fraction of the total weight enclosed by the isocontours
+
 
     Returns
     -------
@@ -255,41 +260,7 @@ def compute_isocontour_range(v, npoints):
     cumulative_threshold: float
 
     """
-    cumulative_threshold = 0.85
-
-    sum_weight = 0
-
-    #Store the points with their weights and compute the sum of weights
-    sorted_points = np.zeros((int(npoints),2))
-    for i in range(0, int(npoints)):
-        value = v[i]
-        weight = np.power(np.abs(value), 1.0)
-        sum_weight += weight
-        sorted_points[i] = [weight, value]
-
-    #Sort the points
-    sorted_points = sorted_points[np.argsort(sorted_points[:,1])][::-1]
-
-    #Determine the positve and negative bounds
-
-    sum = 0
-
-    negative_isocontour = 0.0
-    positive_isocontour = 0.0
-
-    for i in range(len(sorted_points)):
-
-        if sorted_points[i,1] >=  0:
-            positive_isocontour = sorted_points[i,1]
-
-        if sorted_points[i,1] <  0:
-            negative_isocontour = sorted_points[i,1]
-
-        sum += sorted_points[i,0] / sum_weight
-
-        if sum > cumulative_threshold:
-            break
-    values = [positive_isocontour, negative_isocontour]
+    values = get_isocontour_range(v[:int(npoints)], cumulative_threshold)
 
     return values, cumulative_threshold
 
@@ -2,6 +2,7 @@
 RGB values of each atom. 
 
 """
+import numpy as np
 
 colors = {
     "H": ["rgba(255, 255, 255, 1.0)", 1],
@@ -59,3 +60,28 @@ colors = {
     "I": ["rgba(0, 241, 0, 1.0)", 53],
     "Xe": ["rgba(251, 20, 145, 1.0)", 54]
 }  #Colors are repeated.
+
+
+def get_element_colorscale(symbols):
+    """
+    Stepped colorscale giving every element of symbols its color
+    Parameters
+    ----------
+    symbols: list<str> element symbols, repeated or not
+    Returns
+    -------
+    (index: np.array<int> position of each symbol among the elements, 
+     colorscale: list, cmax: int)
+        To be used as Mesh3d intensity with cmin=0 and cmax
+    """
+    elements, index = np.unique(np.asarray(symbols), return_inverse=True)
+    cmax = max(len(elements) - 1, 1)
+
+    #plotly.js only accepts colorscales from 0 to 1, also for a single element
+    colorscale = []
+    for i, element in enumerate(elements):
+        start = max(i - 0.5, 0) / cmax
+        end = 1.0 if i == len(elements) - 1 else (i + 0.5) / cmax
+        colorscale += [[start, colors[element][0]], [end, colors[element][0]]]
+
+    return index, colorscale, cmax
@@ -0,0 +1,112 @@
+"""
+
+Compact serialization of figures with large numeric arrays
+
+"""
+import base64
+
+import numpy as np
+import plotly.io as pio
+
+#Arrays shorter than this stay as JSON numbers
+ENCODE_MIN_SIZE = 16
+
+#Typed array types understood by plotly.js
+INTEGER_TYPES = [np.uint8, np.uint16, np.uint32]
+
+
+def encode_array(array, precision=None):
+    """
+    Encode a numeric array as a plotly.js base64 typed array
+    Parameters
+    ----------
+    array: np.array of floats or integers
+    precision: None or int, decimals kept by floats before the cast to float32
+    Returns
+    -------
+    dict {"dtype": str, "bdata": str, "shape": str}, or None for integers
+        no typed array of plotly.js can hold
+        Floats become float32, non-negative integers the smallest unsigned type
+        holding them and other integers int32
+    """
+    array = np.asarray(array)
+
+    if array.dtype.kind == "f":
+        if precision is not None:
+            array = np.round(array, precision)
+        dtype = np.float32
+    elif array.dtype.kind in "iu":
+        if array.size == 0:
+            dtype = np.uint8
+        elif array.min() >= 0:
+            top = array.max()
+            dtype = next((t for t in INTEGER_TYPES if top <= np.iinfo(t).max), None)
+        elif array.min() >= np.iinfo(np.int32).min and array.max() <= np.iinfo(np.int32).max:
+            dtype = np.int32
+        else:
+            dtype = None
+        #plotly.js has no 64 bit integer arrays
+        if dtype is None:
+            return None
+    else:
+        raise ValueError("Only float and integer arrays can be encoded")
+
+    #Typed arrays are little endian
+    array = np.ascontiguousarray(array, dtype=np.dtype(dtype).newbyteorder("<"))
+    spec = {"dtype": array.dtype.str[1:], 
+            "bdata": base64.b64encode(array).decode("ascii")}
+    if array.ndim > 1:
+        spec["shape"] = ",".join(str(n) for n in array.shape)
+
+    return spec
+
+
+def compact_figure(fig, precision=None, min_size=ENCODE_MIN_SIZE):
+    """
+    Plotly figure dict with the large arrays of its traces as base64 typed arrays
+    Parameters
+    ----------
+    fig: go.Figure
+    precision: None or int, decimals kept by float arrays
+    min_size: int, arrays with fewer elements are left as they are
+    Returns
+    -------
+    dict with "data" and "layout", to be passed to plotly.io with validate=False
+        Requires plotly.js 2.28 or newer to be displayed
+    """
+    figure = fig.to_plotly_json()
+    figure["data"] = [_encode_arrays(trace, precision, min_size) for trace in figure["data"]]
+
+    return figure
+
+
+def write_compact_html(fig, file, precision=None, min_size=ENCODE_MIN_SIZE, **kwargs):
+    """
+    Writes fig to an html file with its large arrays as base64 typed arrays
+    """
+    pio.write_html(compact_figure(fig, precision, min_size), file, validate=False, **kwargs)
+
+
+def decode_array(spec):
+    """
+    Numpy array of a plotly.js base64 typed array
+    """
+    array = np.frombuffer(base64.b64decode(spec["bdata"]), dtype=np.dtype(spec["dtype"]).newbyteorder("<"))
+    if "shape" in spec:
+        array = array.reshape([int(n) for n in str(spec["shape"]).split(",")])
+
+    return array
+
+
+def _encode_arrays(value, precision, min_size):
+    #Recent plotly versions already encode arrays, in their original type
+    if isinstance(value, dict) and "bdata" in value and "dtype" in value:
+        value = decode_array(value)
+    elif isinstance(value, dict):
+        return {key: _encode_arrays(item, precision, min_size) for key, item in value.items()}
+
+    if isinstance(value, np.ndarray) and value.dtype.kind in "fiu" and value.size >= min_size:
+        spec = encode_array(value, precision)
+        return value.tolist() if spec is None else spec
+
+    return value
@@ -6,19 +6,28 @@ Creates main figure
 import numpy as np
 import qcelemental as qcel
 import plotly.graph_objects as go
+import plotly.io as pio
 
-from ..layers.bonds import get_bonds
-from ..layers.geometry import get_atoms
+from ..layers.bonds import get_bonds, get_bonds_mesh, get_bond_lines
+from ..layers.geometry import get_atoms, get_atoms_mesh, get_atoms_points, POINTS_THRESHOLD
+from ..molecule.connectivity import guess_connectivity
 # from ..layers.measurements import get_angle, get_line
 from ..layers.cube import get_cubes, cube_to_molecule, get_cubes, get_cube_trace
+from ..layers.cube import get_cube_headers, get_cube_range, meta_to_molecule, write_cube, crop_cube, resolve_iso
 from .layouts import get_layout, get_range
-from .widgets import get_buttons, get_buttons_wfn, get_slider
+from .widgets import get_buttons, get_buttons_wfn, get_slider, get_iso_slider
+from ..layers.volume import Volume
+from ..layers.isosurface import get_cube_mesh
+from ..molecule.shapes import QUALITY, VERTEX_BUDGET, pick_quality
+from ..layers.pyramid import get_pyramid, pick_level, get_level, VOXEL_BUDGET
+from .lazy import LazyCubes
+from .export import compact_figure, write_compact_html
 
 from ..advanced import cubeprop
 
 
 class Figure():
-    def __init__(self, surface="matte", figsize=None, **kwargs):
+    def __init__(self, surface="matte", figsize=None, cache=None, dtype=np.float64, quality="auto", **kwargs):
 
         self.fig = go.Figure()
         self.molecules = {}
@@ -27,9 +36,36 @@ class Figure():
         self.resolution = figsize
         self.min_range = 0.0
         self.max_range = 0.0
+        self.cache = cache
+        #float32 halves the memory and payload of every mesh and volume
+        self.dtype = np.dtype(dtype)
+        self.volumes = []
+        #Tessellation of atoms and bonds, see shapes.QUALITY
+        self.quality = self.check_quality(quality)
+
+    def show(self, compact=False, precision=None):
+        """
+        Displays the figure. 
+        
+        compact=True sends large arrays as base64 float32/uint typed arrays,
+        with floats rounded to precision decimals if given. The figure is 
+        then shown as a static plot, without FigureWidget callbacks.
+        """
+        if compact is True:
+            pio.show(compact_figure(self.fig, precision), validate=False)
+        else:
+            self.fig.show()
 
-    def show(self):
-        self.fig.show()
+    def write_html(self, file, compact=True, precision=None, **kwargs):
+        """
+        Saves the figure to an html file, with large arrays as base64 
+        float32/uint typed arrays unless compact is False. 
+        Other arguments are passed to plotly.io.write_html.
+        """
+        if compact is True:
+            write_compact_html(self.fig, file, precision, **kwargs)
+        else:
+            self.fig.write_html(file, **kwargs)
 
     def assert_range(self, geometry):
         self.min_range = self.min_range if self.min_range < np.min(geometry) else np.min(geometry)
@@ -38,6 +74,25 @@ class Figure():
         range_layout = get_range(self.min_range, self.max_range)
         self.fig.update_layout(range_layout)
 
+    def check_quality(self, quality):
+        if quality != "auto" and quality not in QUALITY:
+            raise ValueError("Only avaliable qualities are \"auto\", \"low\", \"medium\" and \"high\"")
+        return quality
+
+    def get_quality(self, symbols, bonds, quality=None, max_vertices=VERTEX_BUDGET):
+        """
+        Tessellation preset of the atoms and bonds of a molecule. 
+        
+        quality overrides the one of the figure, "auto" picks the finest 
+        preset within max_vertices for this number of atoms and bonds.
+        """
+        quality = self.check_quality(self.quality if quality is None else quality)
+        if quality != "auto":
+            return quality
+
+        ncylinders = sum(1 if symbols[idx1] == symbols[idx2] else 2 for idx1, idx2 in bonds)
+        return pick_quality(len(symbols), ncylinders, max_vertices)
+
     def get_connectivity(self, molecule):
 
         mol_dict = molecule.dict()
@@ -45,23 +100,69 @@ class Figure():
         geometry = molecule.geometry
         
         if not "connectivity" in mol_dict:
-            return qcel.molutil.guess_connectivity(symbols,geometry)
+            return guess_connectivity(symbols,geometry)
         
         elif mol_dict["connectivity"] is None:
-            return qcel.molutil.guess_connectivity(symbols,geometry)
+            return guess_connectivity(symbols,geometry)
 
         elif "connectivity" in mol_dict:
             return self.dict["connectivity"]
 
     #Basic Traces
 
-    def add_molecule(self, name, molecule, style="ball_and_stick"):
+    def add_molecule(self, name, molecule, style="ball_and_stick", merge=True, quality=None, 
+                     max_vertices=VERTEX_BUDGET, max_atoms=POINTS_THRESHOLD, point_bonds=False):
+        """
+        Adds the atoms and bonds of a molecule to the figure.
+
+        Parameters
+        ----------
+        name : str
+            Label of the molecule, used by add_measurement
+        molecule : qcelemental Molecule
+        style : str
+            How bonds and atoms are represented within the plot. "points" 
+            draws every atom as a marker of a single Scatter3d trace, 
+            sized by the ball_and_stick radii, or the spacefilling ones 
+            when a spacefilling molecule is above max_atoms
+        merge : boolean
+            Plots all atoms as one Mesh3d trace and all bonds as another,
+            so the number of traces does not grow with the molecule. 
+            False plots a trace per atom and per bond.
+        quality : None, "auto", "low", "medium" or "high"
+            Tessellation of atoms and bonds, the one of the figure if None.
+            "auto" picks the finest preset within max_vertices, so large 
+            molecules stay interactive and small ones smooth.
+        max_vertices : int
+            Vertex budget of quality="auto"
+        max_atoms : int
+            Molecules with more atoms are drawn with style="points"
+        point_bonds : boolean
+            With style="points", also draws the bonds as a single line trace
+        """
 
         self.molecules[name] = molecule
 
-        bonds = self.get_connectivity(molecule)
-        bond_list = get_bonds(molecule.geometry, molecule.symbols, bonds, style, self.surface)
-        atom_list = get_atoms(molecule.geometry, molecule.atomic_numbers, molecule.symbols, style, self.surface)
+        #Markers keep the spacefilling radii of a requested spacefilling style
+        radii = "spacefilling" if style == "spacefilling" else "ball_and_stick"
+        if len(molecule.symbols) > max_atoms:
+            style = "points"
+
+        if style == "points":
+            bond_list = []
+            if point_bonds is True:
+                bond_list = get_bond_lines(molecule.geometry, self.get_connectivity(molecule), dtype=self.dtype)
+            atom_list = get_atoms_points(molecule.geometry, molecule.atomic_numbers, molecule.symbols, radii=radii, dtype=self.dtype)
+        elif merge is True:
+            bonds = self.get_connectivity(molecule)
+            quality = self.get_quality(molecule.symbols, bonds, quality, max_vertices)
+            bond_list = get_bonds_mesh(molecule.geometry, molecule.symbols, bonds, style, self.surface, dtype=self.dtype, quality=quality)
+            atom_list = get_atoms_mesh(molecule.geometry, molecule.atomic_numbers, molecule.symbols, style, self.surface, dtype=self.dtype, quality=quality, bonds=bonds)
+        else:
+            bonds = self.get_connectivity(molecule)
+            quality = self.get_quality(molecule.symbols, bonds, quality, max_vertices)
+            bond_list = get_bonds(molecule.geometry, molecule.symbols, bonds, style, self.surface, dtype=self.dtype, quality=quality)
+            atom_list = get_atoms(molecule.geometry, molecule.atomic_numbers, molecule.symbols, style, self.surface, dtype=self.dtype, quality=quality, bonds=bonds)
 
         #Add traces
         for bond in bond_list:
@@ -75,16 +176,21 @@ class Figure():
         self.assert_range(molecule.geometry)
 
     def add_cube(self, file, iso=0.01, plot_geometry=True, 
-                 colorscale="portland", opacity=0.2, style="ball_and_stick"):
+                 colorscale="portland", opacity=0.2, style="ball_and_stick",
+                 resolution=None, max_voxels=VOXEL_BUDGET, engine="isosurface", crop=False, 
+                 slider="traces"):
         """
         Adds an isosurface plot to the figure from a cube file.
         
         Parameters
         ----------
-        file : str
-            The path to the cube file
-        iso : float, tuple, or list
+        file : str or Volume
+            The path to the cube file, optionally compressed (.gz, .bz2, .xz),
+            or a Volume expression such as Volume.from_cube(a) - Volume.from_cube(b)
+        iso : float, tuple, list, "auto" or ("fraction", f)
             If a float is given, the single isosurface is plotted
+            "auto" plots the isosurface enclosing 85% of the total |value|,
+            ("fraction", f) the one enclosing a fraction f of it
             Otherwise, all isosurface plots can be navigated via a slider
         plot_geometry : boolean
             Plots bonds and atoms if True, only plots the isosurface(s) if False
@@ -94,14 +200,64 @@ class Figure():
             The degree of transparency for the isosurface(s)
         style : str
             How bonds and atoms are represented within the plot
+        resolution : None, "auto" or int
+            None plots the full volume. Otherwise a pyramid of 2x, 4x and 8x 
+            block-averaged volumes is built and the given block factor is 
+            plotted, or with "auto" the finest one within max_voxels. 
+            Finer levels can be swapped in later with set_cube_resolution.
+        max_voxels : int
+            Voxel budget of resolution="auto"
+        engine : str
+            "isosurface" sends the volume to plotly.js as an Isosurface trace,
+            "mesh" extracts the surfaces in Python and sends a compact Mesh3d
+        crop : boolean
+            Only plots the box of voxels reaching the smallest isovalue, 
+            padded by one voxel
+        slider : str
+            With several isovalues, "traces" adds one trace per isovalue and 
+            toggles their visibility, "restyle" keeps a single Isosurface trace
+            and only changes its isomin/isomax, so the figure size does not 
+            grow with the number of isovalues
         """
 
-        geometry, symbols, atomic_numbers, spacing, origin, cube = cube_to_molecule(file)
+        if engine == "isosurface":
+            build_trace = get_cube_trace
+        elif engine == "mesh":
+            build_trace = get_cube_mesh
+        else:
+            raise ValueError("Only avaliable engines are \"isosurface\" and \"mesh\"")
+
+        if slider not in ["traces", "restyle"]:
+            raise ValueError("Only avaliable sliders are \"traces\" and \"restyle\"")
+        if slider == "restyle" and engine != "isosurface":
+            raise ValueError("slider=\"restyle\" requires engine=\"isosurface\"")
+
+        if isinstance(file, Volume):
+            cube = file.to_array(dtype=self.dtype)
+            geometry, symbols, atomic_numbers, spacing, origin = meta_to_molecule(file.meta)
+        else:
+            geometry, symbols, atomic_numbers, spacing, origin, cube = cube_to_molecule(file, cache=self.cache, dtype=self.dtype)
+            if cube.ndim != 3:
+                raise ValueError("Cube files with several orbitals or values per voxel are only avaliable through add_cubes")
+
+        iso = resolve_iso(cube, iso)
+
+        if crop is True:
+            cube, origin = crop_cube(cube, spacing, origin, iso if type(iso) == float else min(iso))
+
+        if resolution is not None:
+            pyramid = get_pyramid(cube, spacing, origin)
+            if resolution == "auto":
+                level = pick_level(pyramid, max_voxels)
+            else:
+                level = get_level(pyramid, resolution)
+            cube, spacing, origin = level["cube"], level["spacing"], level["origin"]
     
         if plot_geometry is True:
             bonds = qcel.molutil.guess_connectivity(symbols, geometry)
-            bond_list = get_bonds(geometry, symbols, bonds, style, self.surface)
-            atom_list = get_atoms(geometry, atomic_numbers, symbols, style, self.surface)
+            quality = self.get_quality(symbols, bonds)
+            bond_list = get_bonds(geometry, symbols, bonds, style, self.surface, dtype=self.dtype, quality=quality)
+            atom_list = get_atoms(geometry, atomic_numbers, symbols, style, self.surface, dtype=self.dtype, quality=quality, bonds=bonds)
             
             #Add traces
             for bond in bond_list:
@@ -109,30 +265,77 @@ class Figure():
             for atom in atom_list:
                 self.fig.add_trace(atom)
 
+        geometry_traces = len(self.fig.data)
+
         #Single value of iso
         if type(iso) == float: 
-            trace, min_range, max_range = get_cube_trace(cube, spacing, origin, iso, colorscale, opacity) 
+            trace, min_range, max_range = build_trace(cube, spacing, origin, iso, colorscale, opacity) 
             #Add traces
             self.fig.add_trace(trace)
             
+        #Slider restyling a single trace
+        elif slider == "restyle":
+            trace, min_range, max_range = build_trace(cube, spacing, origin, iso[0], colorscale, opacity)
+            self.fig.add_trace(trace)
+
+            slider = get_iso_slider(iso, geometry_traces)
+            self.fig.update_layout(sliders=slider)
+
         #Slider with multiple iso value
         elif type(iso) == list or type(iso) == tuple:
-            geometry_traces = len(self.fig.data)
             for i, iso_i in enumerate(iso):
                 if i == 0:
-                    trace, min_range, max_range = get_cube_trace(cube, spacing, origin, iso_i, colorscale, opacity, visible=True)
+                    trace, min_range, max_range = build_trace(cube, spacing, origin, iso_i, colorscale, opacity, visible=True)
                 elif i != 0:
-                    trace, min_range, max_range = get_cube_trace(cube, spacing, origin, iso_i, colorscale, opacity, visible=False)
+                    trace, min_range, max_range = build_trace(cube, spacing, origin, iso_i, colorscale, opacity, visible=False)
                 
                 self.fig.add_trace(trace)
 
             slider = get_slider(iso, geometry_traces)
             self.fig.update_layout(sliders=slider)
 
+        if resolution is not None:
+            self.volumes.append({"pyramid": pyramid, 
+                                 "traces": list(range(geometry_traces, len(self.fig.data))),
+                                 "isos": [iso] if type(iso) == float else list(iso),
+                                 "engine": engine})
+
         #Update layout
         self.fig.update_layout(get_layout(self.resolution))
         self.assert_range([min_range, max_range])
 
+    def set_cube_resolution(self, resolution, volume=-1, max_voxels=VOXEL_BUDGET):
+        """
+        Swaps the isosurfaces of a cube added with add_cube(resolution=...) 
+        to another level of its pyramid.
+
+        Parameters
+        ----------
+        resolution : "auto" or int
+            Block factor of the level, 1 being the full volume
+        volume : int
+            Index of the cube among those added with a resolution, last by default
+        max_voxels : int
+            Voxel budget of resolution="auto"
+        """
+        record = self.volumes[volume]
+        if resolution == "auto":
+            level = pick_level(record["pyramid"], max_voxels)
+        else:
+            level = get_level(record["pyramid"], resolution)
+
+        with self.fig.batch_update():
+            if record["engine"] == "isosurface":
+                trace, _, _ = get_cube_trace(level["cube"], level["spacing"], level["origin"], 0.0, None, None)
+                for index in record["traces"]:
+                    self.fig.data[index].update(x=trace.x, y=trace.y, z=trace.z, value=trace.value)
+            else:
+                #Surfaces depend on the isovalue and are extracted again
+                for index, iso in zip(record["traces"], record["isos"]):
+                    trace, _, _ = get_cube_mesh(level["cube"], level["spacing"], level["origin"], iso, None, None)
+                    self.fig.data[index].update(x=trace.x, y=trace.y, z=trace.z, 
+                                                i=trace.i, j=trace.j, k=trace.k, intensity=trace.intensity)
+
 
     def add_measurement(self, mol_label, m, 
                         line_width=20,
@@ -166,14 +369,60 @@ class Figure():
         elif len(m) == 4:
             print("Unable to add dihedral")
 
-    def add_cubes(self, directory=".", iso=0.03, style="ball_and_stick", colorscale="portland", opacity=0.3):
-        cubes, details = get_cubes(directory)
-        geometry, symbols, atomic_numbers, spacing, origin, _ = cube_to_molecule(details[0]["name"]+".cube")
-        bonds = qcel.molutil.guess_connectivity(symbols, geometry)
+    def add_cubes(self, directory=".", iso=0.03, style="ball_and_stick", colorscale="portland", opacity=0.3,
+                  workers=None, timings=False, lazy=False, max_bytes=None, files=None, catalog=None, crop=False):
+        """
+        Adds every cube file of a directory, navigated through a dropdown menu.
 
+        Parameters
+        ----------
+        directory : str
+            The directory holding the cube files, or a single cube file 
+            with several orbitals, each of them becoming a dropdown entry
+        iso : float, "auto" or ("fraction", f)
+            The isovalue of every isosurface, or the fraction of the total
+            |value| enclosed by the isosurface of each cube, 85% for "auto"
+        style : str
+            How bonds and atoms are represented within the plot
+        colorscale : str
+            The color scheme
+        opacity : float
+            The degree of transparency for the isosurfaces
+        workers : int
+            Number of processes used to parse the cube files
+        timings : boolean
+            Prints the parse time of each file if True
+        lazy : boolean
+            Only reads the headers up front and parses each cube when its 
+            dropdown entry is first selected. Requires a Jupyter FigureWidget.
+        max_bytes : int
+            With lazy=True, the least recently viewed volumes are dropped 
+            once the loaded traces, values and coordinates, take more than max_bytes
+        files : list
+            Subset of the cube files of the directory, e.g. from CubeCatalog.files
+        catalog : CubeCatalog
+            With lazy=True, headers are looked up in the catalog instead of read
+        crop : boolean
+            Only plots the box of voxels of each cube reaching iso, padded by one voxel
+        """
+        if lazy is True:
+            self.add_lazy_cubes(directory, iso, style, colorscale, opacity, max_bytes, files, catalog, crop)
+            return
+
+        cubes, details = get_cubes(directory, cache=self.cache, workers=workers, dtype=self.dtype, files=files)
+        if timings is True:
+            #Orbitals of one file share its parse time
+            parse_times = {cube_i["file"]: cube_i["parse_time"] for cube_i in details}
+            for cube_file, parse_time in parse_times.items():
+                print(f"{cube_file}: {parse_time:.3f} s")
+            print(f"Parsed {len(parse_times)} cube files in {sum(parse_times.values()):.3f} s of parse time")
+
+        geometry, symbols, atomic_numbers, spacing, origin = meta_to_molecule(details[0])
+        bonds = qcel.molutil.guess_connectivity(symbols, geometry)
+        quality = self.get_quality(symbols, bonds)
 
-        bond_list = get_bonds(geometry, symbols, bonds, style, self.surface)
-        atom_list = get_atoms(geometry, atomic_numbers, symbols, style, self.surface)
+        bond_list = get_bonds(geometry, symbols, bonds, style, self.surface, dtype=self.dtype, quality=quality)
+        atom_list = get_atoms(geometry, atomic_numbers, symbols, style, self.surface, dtype=self.dtype, quality=quality, bonds=bonds)
 
         for bond in bond_list:
             self.fig.add_trace(bond)
@@ -186,7 +435,11 @@ class Figure():
         min_list = []
         max_list = []
         for cube in cubes:
-            trace, min_range, max_range = get_cube_trace(cube, spacing, origin, iso, colorscale,opacity, visible=False)
+            cube_origin = origin
+            cube_iso = resolve_iso(cube, iso)
+            if crop is True:
+                cube, cube_origin = crop_cube(cube, spacing, origin, cube_iso)
+            trace, min_range, max_range = get_cube_trace(cube, spacing, cube_origin, cube_iso, colorscale,opacity, visible=False)
             cube_list.append(trace)
             min_list.append(min_range)
             max_list.append(max_range)
@@ -209,11 +462,79 @@ class Figure():
         self.fig.update_layout(get_layout(self.resolution))
         self.assert_range([min(min_list), max(max_list)])
 
+    def add_lazy_cubes(self, directory, iso, style, colorscale, opacity, max_bytes, files=None, catalog=None, 
+                       crop=False):
+
+        if not isinstance(self.fig, go.FigureWidget):
+            self.fig = go.FigureWidget(self.fig)
+
+        headers = get_cube_headers(directory, files=files, catalog=catalog)
+        geometry, symbols, atomic_numbers, _, _ = meta_to_molecule(headers[0])
+        bonds = qcel.molutil.guess_connectivity(symbols, geometry)
+        quality = self.get_quality(symbols, bonds)
+
+        bond_list = get_bonds(geometry, symbols, bonds, style, self.surface, dtype=self.dtype, quality=quality)
+        atom_list = get_atoms(geometry, atomic_numbers, symbols, style, self.surface, dtype=self.dtype, quality=quality, bonds=bonds)
+
+        for bond in bond_list:
+            self.fig.add_trace(bond)
+        for atom in atom_list:
+            self.fig.add_trace(atom)
+
+        geometry_traces = len(self.fig.data)
+
+        self.lazy_cubes = LazyCubes(self.fig, headers, geometry_traces, iso, colorscale, opacity, 
+                                    cache=self.cache, max_bytes=max_bytes, dtype=self.dtype, crop=crop)
+        self.fig.add_traces(self.lazy_cubes.placeholders())
+
+        button_list = get_buttons(headers, geometry_traces, directory)
+
+        self.fig.update_layout(updatemenus=[dict(showactive=True,
+                                                buttons=button_list,
+                                                font={"family": "Helvetica",
+                                                      "size" : 18},
+                                                borderwidth=0
+            ),
+        ])
+        self.lazy_cubes.watch()
+
+        ranges = []
+        for header in headers:
+            spacing = [header["xvec"][0], header["yvec"][1], header["zvec"][2]]
+            ranges.append(get_cube_range(header["shape"], spacing, header["origin"]))
+
+        #Update layout
+        self.fig.update_layout(get_layout(self.resolution))
+        self.assert_range([min(r[0] for r in ranges), max(r[1] for r in ranges)])
+
 
     #Psi4 Traces
 
     def add_density(self, name, wfn, iso=0.03, colorscale="portland", opacity=0.3, geometry=True, 
-                    spacing=[0.2, 0.2, 0.2], overage=[4.0, 4.0, 4.0]):
+                    spacing=[0.2, 0.2, 0.2], overage=[4.0, 4.0, 4.0], save_to=None):
+        """
+        Adds an isosurface plot of the alpha density of a Psi4 wavefunction.
+
+        Parameters
+        ----------
+        name : str
+            Label of the density
+        wfn : psi4.core.Wavefunction
+            Wavefunction object from Psi4 energy calculation
+        iso : float
+            The isovalue of the isosurface
+        colorscale : str
+            The color scheme
+        opacity : float
+            The degree of transparency for the isosurface
+        spacing : list
+            Grid spacing in bohr for x, y, z
+        overage : list
+            Spatial extent added around the molecule for x, y, z
+        save_to : str
+            If given, the density grid is written to this cube file so it 
+            can be reloaded later with add_cube
+        """
 
         molecule = qcel.models.Molecule.from_data(wfn.basisset().molecule().save_string_xyz())
         self.add_molecule("name"+"_geometry", molecule)
@@ -224,7 +545,16 @@ class Figure():
         O, N =  cubeprop.build_grid(wfn, L, D) 
         block, points, nxyz, npoints =  cubeprop.populate_grid(wfn, O, N, D)
         volume = cubeprop.compute_density(O, N, D, npoints, points, nxyz, block, wfn.Da())
-        trace, min_range, max_range = get_cube_trace(volume, spacing, O, iso, colorscale, opacity)
+
+        if save_to is not None:
+            meta = {"origin": list(O),
+                    "xvec": [D[0], 0.0, 0.0],
+                    "yvec": [0.0, D[1], 0.0],
+                    "zvec": [0.0, 0.0, D[2]],
+                    "geometry": [(z, [float(z)] + list(xyz)) for z, xyz in zip(molecule.atomic_numbers, molecule.geometry)]}
+            write_cube(save_to, volume, meta, comments=["moly Gaussian Cube File.", f"Property: {name} Da [e/a0^3]."])
+
+        trace, min_range, max_range = get_cube_trace(volume.astype(self.dtype), spacing, O, iso, colorscale, opacity)
 
         self.fig.add_trace(trace)
         self.fig.update_layout(get_layout(self.resolution))
@@ -0,0 +1,123 @@
+"""
+
+Loads the volumes of a cube dropdown on demand
+
+"""
+
+from collections import OrderedDict
+
+import numpy as np
+import plotly.graph_objects as go
+
+from ..layers.cube import cube_to_array, get_cube_trace, crop_cube, resolve_iso
+
+
+class LazyCubes():
+    """
+    Keeps one placeholder Isosurface per cube (or orbital) in a FigureWidget and
+    parses a cube only when its dropdown entry is first selected.
+    Once the loaded traces (values and x, y, z coordinates) exceed max_bytes,
+    the least recently viewed ones are dropped from the figure and parsed
+    again when selected.
+    Files with several orbitals are parsed once and kept, within max_bytes,
+    while any of their orbitals is loaded; with a cache they are memory maps.
+    """
+    def __init__(self, fig, headers, trace_offset, iso, colorscale, opacity, cache=None, max_bytes=None,
+                 dtype=np.float64, crop=False):
+
+        self.fig = fig
+        self.headers = headers
+        self.trace_offset = trace_offset
+        self.iso = iso
+        self.colorscale = colorscale
+        self.opacity = opacity
+        self.cache = cache
+        self.max_bytes = max_bytes
+        self.dtype = dtype
+        self.crop = crop
+        self.loaded = OrderedDict()
+        self.parsed = {}
+
+    def placeholders(self):
+        return [go.Isosurface(visible=False, name=header["name"]) for header in self.headers]
+
+    def watch(self):
+        """
+        Loads a cube when its placeholder is made visible. Dropdown buttons
+        restyle the visibility of every trace, which the widget syncs back
+        from the browser, unlike the active button of the menu.
+        """
+        placeholders = self.fig.data[self.trace_offset:self.trace_offset + len(self.headers)]
+        for index, trace in enumerate(placeholders):
+            trace.on_change(self.on_visible(index), "visible")
+
+    def on_visible(self, index):
+        def callback(trace, visible):
+            if visible is True:
+                self.load(index)
+        return callback
+
+    def load(self, index):
+        if index in self.loaded:
+            self.loaded.move_to_end(index)
+            return
+
+        header = self.headers[index]
+        cube, meta = self.read(header)
+        spacing = [meta["xvec"][0], meta["yvec"][1], meta["zvec"][2]]
+        origin = meta["origin"]
+        iso = resolve_iso(cube, self.iso)
+        if self.crop is True:
+            cube, origin = crop_cube(cube, spacing, origin, iso)
+        trace, _, _ = get_cube_trace(cube, spacing, origin, iso, 
+                                     self.colorscale, self.opacity)
+
+        properties = trace.to_plotly_json()
+        properties.pop("type")
+        properties.pop("visible")
+        self.fig.data[self.trace_offset + index].update(properties)
+
+        #Each voxel also holds its x, y and z coordinates
+        self.loaded[index] = sum(np.asarray(trace[key]).nbytes for key in ("x", "y", "z", "value"))
+        self.evict()
+
+    def read(self, header):
+        """
+        Volume of a header, orbitals are sliced from their file parsed once
+        """
+        if "value" not in header:
+            return cube_to_array(header["file"], cache=self.cache, dtype=self.dtype)
+
+        if header["file"] in self.parsed:
+            cube, meta = self.parsed[header["file"]]
+        else:
+            cube, meta = cube_to_array(header["file"], cache=self.cache, dtype=self.dtype)
+            #Cached files are memory maps, reopened at no cost
+            if not self.cache:
+                self.parsed[header["file"]] = (cube, meta)
+
+        return cube[header["value"]], meta
+
+    def held_bytes(self):
+        return sum(self.loaded.values()) + sum(cube.nbytes for cube, _ in self.parsed.values())
+
+    def evict(self):
+        if self.max_bytes is None:
+            return
+        #The volume just selected is always kept
+        while len(self.loaded) > 1 and self.held_bytes() > self.max_bytes:
+            index, _ = self.loaded.popitem(last=False)
+            self.fig.data[self.trace_offset + index].update(x=None, y=None, z=None, value=None)
+            self.release()
+
+        #Parsed files are only kept within the budget
+        if self.held_bytes() > self.max_bytes:
+            self.parsed.clear()
+
+    def release(self):
+        """
+        Drops parsed files without any loaded orbital
+        """
+        files = {self.headers[index]["file"] for index in self.loaded}
+        for cube_file in set(self.parsed) - files:
+            del self.parsed[cube_file]
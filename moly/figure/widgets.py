@@ -11,7 +11,7 @@ def get_buttons(meta, geo_traces, folder):
                                 "annotations": []}]))
 
     for cube_i in meta:
-        button = dict(label=cube_i["name"][dirlenght:],
+        button = dict(label=cube_i.get("label", cube_i["name"][dirlenght:]),
                          method="update",
                          args=[{"visible": [True for traces in range(geo_traces)] + [True if cube_i['name'] == cube_j['name'] else False for cube_j in meta]},
                                {"title": "",
@@ -53,3 +53,25 @@ def get_slider(iso, geometry_traces):
                     steps=steps)]
 
     return sliders
+
+def get_iso_slider(iso, trace_index):
+    """
+    Slider restyling the isovalue of a single Isosurface trace
+    Parameters
+    ----------
+    iso: list<float> isovalues of the steps
+    trace_index: int index of the Isosurface in the figure
+    """
+    steps = []
+    for iso_i in iso:
+        one_step = {'method': "restyle", 
+                    'label': str(iso_i), 
+                    'args': [{"isomin": [-1 * iso_i], "isomax": [iso_i]}, [trace_index]]}
+        steps.append(one_step)
+
+    sliders = [dict(active=0,
+                    currentvalue={"prefix": "Iso: "},
+                    pad={"t": 50},
+                    steps=steps)]
+
+    return sliders
@@ -1,20 +1,26 @@
 
 import numpy as np
 import plotly.graph_objects as go
-from ..molecule.shapes import rotation_matrix
-from ..molecule.shapes import get_single_cylinder
-from ..figure.colors import colors
+from ..molecule.shapes import rotation_matrices
+from ..molecule.shapes import get_cylinder_template, QUALITY
+from ..figure.colors import colors, get_element_colorscale
 from ..figure.layouts import surface_materials
 
-def get_bond_mesh(cilinder,bond,symbols, surface):
+#Line width in pixels of the bonds with style="wireframe"
+WIREFRAME_WIDTH = 4
+
+
+def get_bond_mesh(cilinder,bond,symbols, surface, faces):
 
 	lighting = surface_materials[surface]
 
 	mesh = go.Mesh3d({  'x':cilinder[:,0].flatten(),
 						'y':cilinder[:,1].flatten(),
 						'z':cilinder[:,2].flatten(),
+						'i':faces[:,0],
+						'j':faces[:,1],
+						'k':faces[:,2],
 						'color': colors[symbols[bond][0]][0],
-						'alphahull' :0,
 						'flatshading' : True,
 						"cmin"     :-7,
 						'lighting' : lighting,
@@ -25,46 +31,188 @@ def get_bond_mesh(cilinder,bond,symbols, surface):
 	return mesh
 
 
-def get_bonds(geometry, symbols, bonds, style, surface):
+def get_bond_radius(style):
+    """
+    Cylinder radius of the bonds for a style, None when bonds are not drawn
+    """
+    if style == "ball_and_stick" or style == "tubes":
+        return 0.3
+    elif style == "wireframe":
+        return 0.06
+    elif style == "spacefilling":
+        return None
+    else:
+        raise ValueError("Only avaliable styles are \"ball_and_stick\", \"tubes\", \"spacefilling\" and \"wireframe\" ")
+
+
+def get_bond_cylinders(geometry, symbols, bonds, radius, template):
+    """
+    Places a cylinder template on every bond at once
+    Parameters
+    ----------
+    geometry: np.array (natoms, 3)
+    symbols: element symbols of the atoms
+    bonds: list of (idx1, idx2) atom pairs
+    radius: float, radius of the cylinders
+    template: np.array (nvertices, 3), unit cylinder from z=0 to z=1
+    Returns
+    -------
+    (cylinders: np.array (ncylinders, nvertices, 3), atoms: np.array (ncylinders,))
+        Heteronuclear bonds are split at their midpoint into two cylinders, 
+        atoms holds the atom each cylinder takes its color from
+    """
+    geometry = np.asarray(geometry, dtype=float)
+    symbols = np.asarray(symbols)
+    idx1, idx2 = np.asarray(bonds, dtype=int).reshape(-1, 2).T
+    start = geometry[idx1]
+    vector = geometry[idx2] - start
+    same = symbols[idx1] == symbols[idx2]
+
+    #One cylinder per homonuclear bond and two per heteronuclear one, in bond order
+    counts = np.where(same, 1, 2)
+    bond = np.repeat(np.arange(len(counts)), counts)
+    half = np.arange(len(bond)) - np.repeat(np.cumsum(counts) - counts, counts)
+    axis = vector[bond] * np.where(same[bond], 1.0, 0.5)[:, None]
+    origin = start[bond] + half[:, None] * axis
+    atoms = np.where(half == 0, idx1[bond], idx2[bond])
+
+    #Rotation and scaling of the unit template for every cylinder
+    lengths = np.linalg.norm(axis, axis=1)
+    transforms = rotation_matrices(axis) * np.stack([np.full_like(lengths, radius), 
+                                                     np.full_like(lengths, radius), lengths], -1)[:, None, :]
+    cylinders = np.einsum("nij,vj->nvi", transforms, template) + origin[:, None, :]
+
+    return cylinders, atoms
+
+
+def get_bonds(geometry, symbols, bonds, style, surface, dtype=np.float64, quality="medium"):
     
-    trace_list = []
-    for idx1, idx2 in bonds:
-
-        vec1 = geometry[idx1]
-        vec2 = geometry[idx2]
-        length = np.linalg.norm(vec2-vec1)
-        R = rotation_matrix(np.array([0,0,1]), vec2 - vec1)
-
-        if style is "ball_and_stick" or style is "tubes":
-            r = 0.3
-        elif style is "wireframe":
-            r = 0.06
-        elif style is "spacefilling":
-            return []
-        else:
-            raise ValueError("Only avaliable styles are \"ball_and_stick\", \"tubes\", \"spacefilling\" and \"wireframe\" ")
+    if style == "wireframe":
+        return get_bond_lines(geometry, bonds, symbols, width=WIREFRAME_WIDTH, dtype=dtype)
 
-        if symbols[idx1] == symbols[idx2]:
+    r = get_bond_radius(style)
+    if r is None or len(bonds) == 0:
+        return []
 
-            cyl = get_single_cylinder(radius=r)
-            cyl[:,2] *= length
-            cyl = R.dot(cyl.T).T
-            cyl += vec1
+    template, faces = get_cylinder_template(QUALITY[quality]["sides"])
+    cylinders, atoms = get_bond_cylinders(geometry, symbols, bonds, r, template)
+    cylinders = cylinders.astype(dtype)
 
-            mesh = get_bond_mesh(cyl, idx1, symbols, surface)
-            trace_list.append(mesh)
-
-        if symbols[idx1] != symbols[idx2]:
+    trace_list = []
+    for cyl, atom in zip(cylinders, atoms):
+        mesh = get_bond_mesh(cyl, atom, symbols, surface, faces)
+        trace_list.append(mesh)
 
-            cyl = get_single_cylinder(radius=r)
-            cyl[:,2] *= length / 2
-            cyl = R.dot(cyl.T).T
-            cyl_1 = cyl + vec1
-            cyl_2 = cyl + (vec1+vec2)/2
+    return trace_list
 
-            mesh = get_bond_mesh(cyl_1, idx1, symbols, surface)
-            trace_list.append(mesh)
-            mesh = get_bond_mesh(cyl_2, idx2, symbols, surface)
-            trace_list.append(mesh)
 
-    return trace_list
+def get_bonds_mesh(geometry, symbols, bonds, style, surface, dtype=np.float64, quality="medium"):
+    """
+    All bonds of a molecule as a single Mesh3d trace
+    Parameters
+    ----------
+    geometry: np.array (natoms, 3)
+    symbols: element symbols of the atoms
+    bonds: list of (idx1, idx2) atom pairs
+    style: str, sets the radius of the cylinders
+    surface: str, material of the cylinders
+    dtype: floating point type of the vertices
+    quality: "low", "medium" or "high", tessellation of the cylinders
+    Returns
+    -------
+    [go.Mesh3d] colored per vertex by element, heteronuclear bonds split at 
+    their midpoint. Empty for spacefilling or without bonds. With wireframe,
+    a single Scatter3d line trace instead.
+    """
+    if style == "wireframe":
+        return get_bond_lines(geometry, bonds, symbols, width=WIREFRAME_WIDTH, dtype=dtype)
+
+    r = get_bond_radius(style)
+    if r is None or len(bonds) == 0:
+        return []
+
+    template, faces = get_cylinder_template(QUALITY[quality]["sides"])
+    cylinders, atoms = get_bond_cylinders(geometry, symbols, bonds, r, template)
+
+    ncylinders, nvertices = cylinders.shape[:2]
+    vertices = cylinders.reshape(-1, 3).astype(dtype)
+    faces = (faces[None] + nvertices * np.arange(ncylinders, dtype=np.int32)[:, None, None]).reshape(-1, 3)
+    index, colorscale, cmax = get_element_colorscale(np.asarray(symbols)[atoms])
+
+    mesh = go.Mesh3d({  'x': vertices[:, 0],
+                        'y': vertices[:, 1],
+                        'z': vertices[:, 2],
+                        'i': faces[:, 0],
+                        'j': faces[:, 1],
+                        'k': faces[:, 2],
+                        'intensity': np.repeat(index, nvertices).astype(np.uint8),
+                        'colorscale': colorscale,
+                        'cmin': 0,
+                        'cmax': cmax,
+                        'showscale': False,
+                        'flatshading' : True,
+                        'lighting' : surface_materials[surface],
+                        'lightposition' : {"x":100,
+                                           "y":200,
+                                           "z":0}})
+
+    return [mesh]
+
+
+def get_bond_lines(geometry, bonds, symbols=None, width=2, color="rgba(128, 128, 128, 1.0)", dtype=np.float64):
+    """
+    All bonds of a molecule as the segments of a single Scatter3d line trace
+    Parameters
+    ----------
+    geometry: np.array (natoms, 3)
+    bonds: list of (idx1, idx2) atom pairs
+    symbols: None, or element symbols of the atoms to color each half of 
+             the bonds by element, split at their midpoint
+    width: line width in pixels
+    color: str, color of every bond without symbols
+    dtype: floating point type of the coordinates
+    Returns
+    -------
+    [go.Scatter3d], segments are separated by NaN gaps. Empty without bonds.
+    """
+    if len(bonds) == 0:
+        return []
+
+    geometry = np.asarray(geometry, dtype=dtype)
+    idx1, idx2 = np.asarray(bonds, dtype=int).reshape(-1, 2).T
+
+    if symbols is None:
+        #start, end, gap for every bond
+        segments = np.full((len(idx1), 3, 3), np.nan, dtype=dtype)
+        segments[:, 0] = geometry[idx1]
+        segments[:, 1] = geometry[idx2]
+        line = {"width": width, "color": color}
+    else:
+        #start, middle, gap, middle, end, gap for every bond
+        middle = (geometry[idx1] + geometry[idx2]) / 2
+        segments = np.full((len(idx1), 6, 3), np.nan, dtype=dtype)
+        segments[:, 0] = geometry[idx1]
+        segments[:, 1] = middle
+        segments[:, 3] = middle
+        segments[:, 4] = geometry[idx2]
+
+        index, colorscale, cmax = get_element_colorscale(np.asarray(symbols)[np.stack([idx1, idx2], -1)].ravel())
+        line = {"width": width, 
+                "color": np.repeat(index, 3).astype(np.uint8),
+                "colorscale": colorscale,
+                "cmin": 0,
+                "cmax": cmax}
+    segments = segments.reshape(-1, 3)
+
+    lines = go.Scatter3d({
+            'x': segments[:, 0],
+            'y': segments[:, 1],
+            'z': segments[:, 2],
+            'mode': "lines",
+            'line': line,
+            'connectgaps': False,
+            'hoverinfo': "skip",
+            'showlegend': False,
+    })
+
+    return [lines]
@@ -0,0 +1,122 @@
+"""
+
+Binary cache for parsed cube volumes
+
+"""
+
+import hashlib
+import json
+import os
+
+import numpy as np
+
+
+def cache_paths(file, cache):
+    """
+    Locate the cache entry of a cube file
+    Parameters
+    ----------
+    file: path of the cube file
+    cache: True to keep the entry next to the cube file,
+           or the path of a directory shared by every entry
+    Returns
+    -------
+    (array_path: str, meta_path: str)
+    """
+    if cache is True:
+        base = file
+    else:
+        os.makedirs(cache, exist_ok=True)
+        digest = hashlib.sha1(os.path.abspath(file).encode()).hexdigest()[:16]
+        base = os.path.join(cache, f"{os.path.basename(file)}.{digest}")
+
+    return base + ".npy", base + ".json"
+
+def cache_key(file):
+    """
+    Identify the current contents of a file by path, size and mtime
+    """
+    stat = os.stat(file)
+    return {"path": os.path.abspath(file), "size": stat.st_size, "mtime": stat.st_mtime_ns}
+
+def load_cached(file, cache):
+    """
+    Load a parsed cube from the cache
+    Parameters
+    ----------
+    file: path of the cube file
+    cache: see cache_paths
+    Returns
+    -------
+    (data: np.memmap, metadata: dict) or None if there is no valid entry
+    """
+    array_path, meta_path = cache_paths(file, cache)
+    try:
+        with open(meta_path, 'r') as f:
+            meta = json.load(f)
+        if meta.get("key") != cache_key(file):
+            return None
+        data = np.load(array_path, mmap_mode='r')
+    except (OSError, ValueError):
+        return None
+
+    details = meta["details"]
+    details["geometry"] = [tuple(atom) for atom in details["geometry"]]
+
+    return data, details
+
+def store_cached(file, cache, data, details):
+    """
+    Write a parsed cube to the cache.
+    Files are replaced atomically, so figures holding a memory map
+    of a previous entry keep reading valid data.
+    Parameters
+    ----------
+    file: path of the cube file
+    cache: see cache_paths
+    data: np.array of the volume
+    details: metadata dict returned by cube_to_array
+    """
+    array_path, meta_path = cache_paths(file, cache)
+    meta = {"key": cache_key(file), "details": details}
+
+    with open(array_path + ".tmp", 'wb') as f:
+        np.save(f, data)
+    _publish(array_path, meta_path, meta)
+
+def store_cached_slabs(file, cache, slabs, shape, dtype, details):
+    """
+    Write a cube to the cache while its slabs are streamed, without
+    holding the whole volume in memory
+    Parameters
+    ----------
+    file: path of the cube file
+    cache: see cache_paths
+    slabs: iterable of (start, slab) along x, as yielded by iter_cube
+    shape: (nx, ny, nz) of the volume
+    dtype: floating point type of the entry
+    details: metadata dict returned by cube_to_array
+    Yields
+    ------
+    (start, slab) unchanged. The entry is only published after the last slab.
+    """
+    array_path, meta_path = cache_paths(file, cache)
+    meta = {"key": cache_key(file), "details": details}
+
+    data = np.lib.format.open_memmap(array_path + ".tmp", mode='w+', dtype=dtype, shape=tuple(shape))
+    for start, slab in slabs:
+        data[start:start + slab.shape[0]] = slab
+        yield start, slab
+    data.flush()
+    del data
+    _publish(array_path, meta_path, meta)
+
+def _publish(array_path, meta_path, meta):
+    """
+    Move a written .tmp array in place, then its metadata
+    """
+    os.replace(array_path + ".tmp", array_path)
+
+    with open(meta_path + ".tmp", 'w') as f:
+        json.dump(meta, f)
+    os.replace(meta_path + ".tmp", meta_path)
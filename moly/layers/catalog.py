@@ -0,0 +1,149 @@
+"""
+
+Persistent catalog of cube file headers
+
+"""
+
+import fnmatch
+import json
+import os
+import re
+
+from .cache import cache_key
+from .cube import list_cubes, peek_cube, cube_name
+
+CATALOG_FILE = ".moly_catalog.json"
+
+_PROPERTY = re.compile(r"Property:\s*(\S+)")
+_ISOCONTOUR = re.compile(r"Isocontour range for\s*([\d.]+)%.*?\(\s*([^,\s]+)\s*,\s*([^)\s]+)\s*\)")
+
+
+def parse_comment(comment):
+    """
+    Read the property name and isocontour range Psi4 writes in the 
+    second comment line of its cube files
+    Parameters
+    ----------
+    comment: str
+    Returns
+    -------
+    details: dict with "property", "isocontour_percent" and "isocontour_range"
+             set to None when missing
+    """
+    details = {"property": None, "isocontour_percent": None, "isocontour_range": None}
+
+    match = _PROPERTY.search(comment)
+    if match:
+        details["property"] = match.group(1)
+
+    match = _ISOCONTOUR.search(comment)
+    if match:
+        try:
+            details["isocontour_percent"] = float(match.group(1))
+            details["isocontour_range"] = [float(match.group(2)), float(match.group(3))]
+        except ValueError:
+            pass
+
+    return details
+
+
+class CubeCatalog():
+    """
+    Index of the headers of every cube file in a directory.
+    Entries are stored in a JSON file and keyed by path, size and mtime,
+    so only new or modified files are read when the catalog is updated.
+    """
+    def __init__(self, folder, path=None, update=True):
+
+        self.folder = folder
+        self.path = path if path is not None else os.path.join(folder, CATALOG_FILE)
+        self.entries = {}
+
+        if os.path.exists(self.path):
+            with open(self.path, 'r') as f:
+                for entry in json.load(f)["entries"]:
+                    entry["shape"] = tuple(entry["shape"])
+                    entry["geometry"] = [tuple(atom) for atom in entry["geometry"]]
+                    self.entries[entry["file"]] = entry
+
+        if update is True:
+            self.update()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def update(self):
+        """
+        Read the headers of new or modified cube files and drop deleted ones
+        """
+        changed = False
+        files = list_cubes(self.folder)
+
+        for cube_file in files:
+            key = cache_key(cube_file)
+            entry = self.entries.get(cube_file)
+            if entry is not None and entry["key"] == key:
+                continue
+            self.entries[cube_file] = self.read_entry(cube_file, key)
+            changed = True
+
+        for cube_file in set(self.entries) - set(files):
+            del self.entries[cube_file]
+            changed = True
+
+        if changed:
+            self.save()
+
+    def read_entry(self, cube_file, key):
+        entry = peek_cube(cube_file)
+        entry.update({"file": cube_file, 
+                      "name": cube_name(cube_file),
+                      "key": key,
+                      "spacing": [entry["xvec"][0], entry["yvec"][1], entry["zvec"][2]]})
+        entry.update(parse_comment(entry["comments"][1]))
+        return entry
+
+    def save(self):
+        with open(self.path + ".tmp", 'w') as f:
+            json.dump({"folder": self.folder, "entries": [self.entries[f] for f in sorted(self.entries)]}, f)
+        os.replace(self.path + ".tmp", self.path)
+
+    def get(self, cube_file):
+        """
+        Header of a single cube file
+        """
+        return self.entries[cube_file]
+
+    def query(self, name=None, property=None, shape=None, where=None):
+        """
+        Select catalog entries, in sorted file order
+        Parameters
+        ----------
+        name: shell-style pattern matched against the file name, e.g. "psi_a_*"
+        property: property name from the cube comment line, e.g. "Da"
+        shape: (nx, ny, nz) of the grid
+        where: callable taking an entry and returning True to keep it
+        Returns
+        -------
+        entries: list<dict>
+        """
+        selected = []
+        for cube_file in sorted(self.entries):
+            entry = self.entries[cube_file]
+            if name is not None and not fnmatch.fnmatch(os.path.basename(cube_file), name):
+                continue
+            if property is not None and entry["property"] != property:
+                continue
+            if shape is not None and entry["shape"] != tuple(shape):
+                continue
+            if where is not None and not where(entry):
+                continue
+            selected.append(entry)
+
+        return selected
+
+    def files(self, **kwargs):
+        """
+        Paths of the entries selected by query
+        """
+        return [entry["file"] for entry in self.query(**kwargs)]
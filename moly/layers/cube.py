@@ -2,21 +2,31 @@ import plotly.graph_objects as go
 import numpy as np
 import qcelemental as qcel
 import glob
+import os
+import gzip
+import bz2
+import lzma
+import time
+from concurrent.futures import ProcessPoolExecutor
 
 
 from ..figure.layouts import surface_materials
+from .cache import load_cached, store_cached
+
+#Characters of the data block parsed at once by the cube reader
+CHUNK_SIZE = 1 << 22
+
+#Compressed cube files are decompressed while they are parsed
+COMPRESSORS = {".gz": gzip.open, ".bz2": bz2.open, ".xz": lzma.open}
 
 def get_volume(cube, spacing, origin, iso, opacity, color):
 
-    x, y, z = np.mgrid[:cube.shape[0], :cube.shape[1], :cube.shape[2]]
-    x_r = x * spacing[0] + origin[0]
-    y_r = y * spacing[1] + origin[1]
-    z_r = z * spacing[2] + origin[2]
+    x_r, y_r, z_r = get_cube_coordinates(cube.shape, spacing, origin, cube.dtype)
 
-    mesh = go.Isosurface(x = x_r.flatten(),
-                         y = y_r.flatten(), 
-                         z = z_r.flatten(), 
-                        value = molecule.cube.flatten(),
+    mesh = go.Isosurface(x = x_r,
+                         y = y_r, 
+                         z = z_r, 
+                        value = cube.ravel(),
                         surface_count = 2,
                         colorscale = color,
                         showscale=False,
@@ -52,20 +62,125 @@ def get_surface(grid, spacing, origin):
     })
     return mesh
 
-def get_cubes(folder):
-    cube_list = [f for f in glob.glob(folder+"/*.cube")]
+def list_cubes(folder):
+    """
+    Sorted paths of the cube files in a directory, or the path itself 
+    if a single cube file is given
+    """
+    if os.path.isfile(folder):
+        return [folder]
+    cube_list = []
+    for extension in [""] + list(COMPRESSORS):
+        cube_list.extend(glob.glob(folder+"/*.cube"+extension))
+    cube_list = sorted(cube_list)
     if not cube_list:
         raise ValueError("Directory does not contain cube files") 
+
+    return cube_list
+
+def get_cubes(folder, cache=None, workers=None, dtype=np.float64, files=None):
+    """
+    Read every cube file of a directory, in sorted order
+    Parameters
+    ----------
+    folder: directory holding the cube files
+    cache: see cube_to_array
+    workers: number of processes parsing files in parallel.
+             None or 1 parses them one after another.
+    dtype: floating point type of the volumes
+    files: subset of cube files to read instead of the whole directory
+    Returns
+    -------
+    (cubes: list<np.array>, meta: list<dict>)
+        Each metadata dict also holds the file "name" without extension
+        and its "parse_time" in seconds. Files with several orbitals or
+        values per voxel give one entry per orbital, sharing the parsed array.
+    """
+    cube_list = list_cubes(folder) if files is None else sorted(files)
+
+    jobs = [(cube_file, cache, dtype) for cube_file in cube_list]
+    if workers is None or workers <= 1:
+        loaded = [_timed_cube_to_array(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            loaded = list(pool.map(_timed_cube_to_array, jobs))
+
     cubes = []
     meta = []
-    for cube_file in cube_list:
-        cube_np, details = cube_to_array(cube_file)
-        details.update({"name":cube_file[:-5]})
-        cubes.append(cube_np)
-        meta.append(details)
+    for cube_file, (cube_np, details, parse_time) in zip(cube_list, loaded):
+        details.update({"name":cube_name(cube_file), "file":cube_file, "parse_time":parse_time})
+        for entry in split_values(details):
+            cubes.append(cube_np if cube_np.ndim == 3 else cube_np[entry["value"]])
+            meta.append(entry)
         
     return cubes, meta
 
+def split_values(details):
+    """
+    One metadata entry per orbital or value of a cube file
+    Parameters
+    ----------
+    details: metadata or header dict of a cube file, with its "name"
+    Returns
+    -------
+    list<dict>, [details] for cubes with a single value per voxel. Otherwise
+        copies with the index of their volume in "value" and their own
+        "name" and "label"
+    """
+    if details["nval"] == 1:
+        return [details]
+
+    if "orbitals" in details:
+        labels = [f"MO {orbital}" for orbital in details["orbitals"]]
+    else:
+        labels = [f"Value {i + 1}" for i in range(details["nval"])]
+    entries = []
+    for i, label in enumerate(labels):
+        entry = dict(details)
+        entry.update({"name":f"{details['name']} {label}", 
+                      "label":f"{os.path.basename(details['name'])} {label}",
+                      "value":i})
+        entries.append(entry)
+
+    return entries
+
+def get_cube_headers(folder, files=None, catalog=None):
+    """
+    Read only the headers of every cube file of a directory, in sorted order
+    Parameters
+    ----------
+    folder: directory holding the cube files
+    files: subset of cube files instead of the whole directory
+    catalog: CubeCatalog of the directory, headers are then looked up instead of read
+    Returns
+    -------
+    headers: list<dict> from peek_cube, each with the file "name" without extension.
+        Files with several orbitals or values per voxel give one header per
+        orbital, see split_values
+    """
+    if files is None:
+        files = list_cubes(folder) if catalog is None else catalog.files()
+
+    headers = []
+    for cube_file in sorted(files):
+        if catalog is not None:
+            header = catalog.get(cube_file)
+        else:
+            header = peek_cube(cube_file)
+            header.update({"name":cube_name(cube_file), "file":cube_file})
+        headers.extend(split_values(header))
+
+    return headers
+
+def _timed_cube_to_array(job):
+    """
+    Process pool entry point of get_cubes
+    """
+    cube_file, cache, dtype = job
+    start = time.perf_counter()
+    cube_np, details = cube_to_array(cube_file, cache=cache, dtype=dtype)
+    return cube_np, details, time.perf_counter() - start
+
 def get_cubes_surfaces(cubes, spacing, origin, iso, colorscale, opacity):
     cubes_surfaces = []
     traces = []
@@ -114,17 +229,15 @@ def get_cubes_surfaces(cubes, spacing, origin, iso, colorscale, opacity):
     return traces   
 
 def get_cube_trace(cube, spacing, origin, iso, colorscale, opacity, visible=True):
-    x,y,z = np.mgrid[:cube.shape[0], :cube.shape[1], :cube.shape[2]]
-
-    x_r = x * spacing[0] + origin[0]
-    y_r = y * spacing[1] + origin[1]
-    z_r = z * spacing[2] + origin[2]
-
-    #value = cube.flatten()
-    trace = go.Isosurface(  x = x_r.flatten(),
-                            y = y_r.flatten(), 
-                            z = z_r.flatten(), 
-                            value = cube.flatten(),
+    #Also evaluates Volume expressions
+    cube = np.asarray(cube)
+    #Coordinates share the floating point type of the volume
+    x_r, y_r, z_r = get_cube_coordinates(cube.shape, spacing, origin, cube.dtype)
+
+    trace = go.Isosurface(  x = x_r,
+                            y = y_r, 
+                            z = z_r, 
+                            value = cube.ravel(),
                             surface_count = 2,
                             colorscale = colorscale,
                             visible = visible,
@@ -136,69 +249,482 @@ def get_cube_trace(cube, spacing, origin, iso, colorscale, opacity, visible=True
                             caps=dict(x_show=False, y_show=False, z_show=False),
                             opacity=opacity)
         
-    max_range_x = np.max(x_r)
-    max_range_y = np.max(y_r)
-    max_range_z = np.max(z_r)
-    min_range_x = np.min(x_r)
-    min_range_y = np.min(y_r)
-    min_range_z = np.min(z_r)
-    max_range = max(max_range_x, max_range_y, max_range_z)
-    min_range = min(min_range_x, min_range_y, min_range_z)
+    min_range, max_range = get_cube_range(cube.shape, spacing, origin)
 
     return trace, min_range, max_range
 
-def cube_to_molecule(cube_file):
+def get_cube_coordinates(shape, spacing, origin, dtype):
+    """
+    Flattened x, y, z coordinates of every voxel, in cube order
+    Parameters
+    ----------
+    shape: tuple<int> (nx, ny, nz)
+    spacing: tuple<float> grid spacing along x, y, z
+    origin: tuple<float> position of the first voxel
+    dtype: numpy dtype of the coordinates
+    Returns
+    -------
+    (x, y, z): np.array of length nx*ny*nz, built from the 1-D axes
+    """
+    nx, ny, nz = shape
+    axes = [(np.arange(n) * d + o).astype(dtype) for n, d, o in zip(shape, spacing, origin)]
+
+    x = np.repeat(axes[0], ny * nz)
+    y = np.tile(np.repeat(axes[1], nz), nx)
+    z = np.tile(axes[2], nx * ny)
+
+    return x, y, z
+
+def cube_to_molecule(cube_file, cache=None, dtype=np.float64):
+
+    cube , meta = cube_to_array(cube_file, cache=cache, dtype=dtype)
+    geometry, symbols, atomic_numbers, spacing, origin = meta_to_molecule(meta)
+    
+    return geometry, symbols, atomic_numbers, spacing, origin, cube
 
-    cube , meta = cube_to_array(cube_file)
+def meta_to_molecule(meta):
+    """
+    Extract the molecule and grid of a cube from its metadata
+    Parameters
+    ----------
+    meta: metadata dict from cube_to_array or peek_cube
+    Returns
+    -------
+    (geometry, symbols, atomic_numbers, spacing, origin)
+    """
     origin = meta["origin"]
     atoms = meta["geometry"]
     spacing = [meta["xvec"][0], meta["yvec"][1], meta["zvec"][2]]
 
-    geometry = []
-    for atom in atoms:
-        geometry.append(atom[1][1:])
-    geometry = np.array(geometry)
-
-    symbols = []
-    atomic_numbers = []
-    for atom in atoms:
-        symbols.append(qcel.periodictable.to_symbol(atom[0]))
-        atomic_numbers.append(atom[0])
-    symbols = np.array(symbols)
-    atomic_numbers = np.array(atomic_numbers)
+    atomic_numbers = np.array([atom[0] for atom in atoms], dtype=int)
+    geometry = np.array([atom[1][1:] for atom in atoms], dtype=float).reshape(-1, 3)
+
+    #Look up each element once and broadcast back to every atom
+    elements, inverse = np.unique(atomic_numbers, return_inverse=True)
+    element_symbols = np.array([qcel.periodictable.to_symbol(z) for z in elements])
+    symbols = element_symbols[inverse] if len(elements) else np.array([], dtype=str)
+
+    return geometry, symbols, atomic_numbers, spacing, origin
+
+def crop_cube(cube, spacing, origin, iso, padding=1):
+    """
+    Restrict a volume to the box of voxels where |value| >= iso
+    Parameters
+    ----------
+    cube: np.array of shape (nx, ny, nz)
+    spacing: grid spacing along x, y, z
+    origin: position of the first voxel
+    iso: smallest isovalue that will be plotted
+    padding: voxels kept around the box on every side
+    Returns
+    -------
+    (cube: np.array view of the box, origin: list<float> of its first voxel)
+        The whole volume is returned if no voxel reaches iso
+    """
+    mask = np.abs(cube) >= iso
+    if not mask.any():
+        return cube, list(origin)
+
+    box = []
+    for axis in range(3):
+        others = tuple(i for i in range(3) if i != axis)
+        hits = np.nonzero(mask.any(axis=others))[0]
+        first = max(hits[0] - padding, 0)
+        last = min(hits[-1] + padding + 1, cube.shape[axis])
+        box.append(slice(first, last))
+
+    origin = [o + sl.start * d for o, sl, d in zip(origin, box, spacing)]
+
+    return cube[tuple(box)], origin
+
+def get_isocontour_range(values, fraction=0.85):
+    """
+    Isovalues of the surfaces enclosing a fraction of the total |value|
+    Parameters
+    ----------
+    values: np.array of any shape
+    fraction: float, the share of sum(|values|) enclosed by the surfaces
+    Returns
+    -------
+    values: list [positive isovalue, negative isovalue]
+        0.0 for a sign without points inside the surfaces
+    """
+    values = np.asarray(values).ravel()
+    weights = np.abs(values)
+    order = np.argsort(weights)[::-1]
+    cumulative = np.cumsum(weights[order])
+
+    #Points are kept until their cumulative weight exceeds the fraction
+    last = np.searchsorted(cumulative, fraction * cumulative[-1], side="right")
+    kept = values[order[:min(last, values.size - 1) + 1]]
+
+    positive = kept[kept >= 0]
+    negative = kept[kept < 0]
+    positive_isocontour = float(positive.min()) if positive.size > 0 else 0.0
+    negative_isocontour = float(negative.max()) if negative.size > 0 else 0.0
+
+    return [positive_isocontour, negative_isocontour]
+
+def resolve_iso(cube, iso):
+    """
+    Turns iso="auto" or iso=("fraction", f) into the isovalue of a cube 
+    enclosing that fraction of its total |value|, 0.85 for "auto". 
+    Any other iso is returned as is.
+    """
+    if isinstance(iso, str) and iso == "auto":
+        fraction = 0.85
+    elif isinstance(iso, tuple) and len(iso) == 2 and iso[0] == "fraction":
+        fraction = iso[1]
+    elif isinstance(iso, str):
+        raise ValueError("iso should be a number, a list of numbers, \"auto\" or (\"fraction\", f)")
+    else:
+        return iso
+
+    positive, negative = get_isocontour_range(cube, fraction)
+    magnitudes = [m for m in (positive, -negative) if m > 0]
     
-    return geometry, symbols, atomic_numbers, spacing, origin, cube
+    return min(magnitudes) if len(magnitudes) > 0 else 0.0
+
+def get_cube_range(shape, spacing, origin):
+    """
+    Scene range spanned by a cube grid, computed from its header alone
+    Returns
+    -------
+    (min_range: float, max_range: float)
+    """
+    upper = [o + (n - 1) * d for n, d, o in zip(shape, spacing, origin)]
+    return min(min(origin), min(upper)), max(max(origin), max(upper))
 
-def cube_to_array(file):
+def cube_to_array(file, cache=None, dtype=np.float64):
     """
     Read cube file into numpy array
     Parameters
     ----------
-    fname: filename of cube file
+    fname: filename of cube file, optionally compressed (.gz, .bz2, .xz)
+    cache: None to always parse the file, True to keep a binary copy of the
+           volume in a .npy sidecar next to the file, or the path of a cache
+           directory. Cached volumes are returned as read-only memory maps.
+    dtype: floating point type of the volume, float32 halves its memory
     Returns
     --------
     (data: np.array, metadata: dict)
+        Cubes with several orbitals or values per voxel are returned with 
+        shape (nval, nx, ny, nz), listing the orbital indices in metadata["orbitals"]
     """
-    cube_details = {}
-    with open(file, 'r') as cube:
-        cube.readline()
-        cube.readline()  # ignore comments
-        natm, cube_details['origin'] = _getline(cube)
-        nx, cube_details['xvec'] = _getline(cube)
-        ny, cube_details['yvec'] = _getline(cube)
-        nz, cube_details['zvec'] = _getline(cube)
-        cube_details['geometry'] = [_getline(cube) for i in range(natm)]
-        data = np.zeros((nx * ny * nz))
-        idx = 0
-        for line in cube:
-            for val in line.strip().split():
-                data[idx] = float(val)
-                idx += 1
-    data = np.reshape(data, (nx, ny, nz))
-    cube.close()
+    if cache:
+        cached = load_cached(file, cache)
+        if cached is not None and cached[0].dtype == dtype:
+            return cached
+
+    with open_cube(file) as cube:
+        _, shape, cube_details = _read_header(cube)
+        nval = cube_details['nval']
+        if nval == 1:
+            data = np.empty(shape[0] * shape[1] * shape[2], dtype=dtype)
+            _read_values(cube, data)
+            data = np.reshape(data, shape)
+        else:
+            #Values of one voxel are stored together, fill them through a transposed view
+            data = np.empty((nval,) + shape, dtype=dtype)
+            _read_values(cube, np.moveaxis(data, 0, -1))
+
+    if cache:
+        store_cached(file, cache, data, cube_details)
 
     return data, cube_details
 
+def peek_cube(file):
+    """
+    Read only the header of a cube file, the data block is never touched
+    Parameters
+    ----------
+    file: filename of cube file
+    Returns
+    -------
+    header: dict with natoms, origin, xvec, yvec, zvec, shape, geometry
+            and the two comment lines
+    """
+    with open_cube(file) as cube:
+        comments, shape, cube_details = _read_header(cube)
+
+    header = {"natoms": len(cube_details["geometry"]),
+              "shape": shape,
+              "comments": comments}
+    header.update(cube_details)
+
+    return header
+
+def iter_cube(file, max_bytes=64 * 2**20, block=None, dtype=np.float64):
+    """
+    Stream the volume of a cube file in slabs along the first (slowest) axis
+    Parameters
+    ----------
+    file: filename of cube file
+    max_bytes: memory ceiling for a single slab. At least one plane is always read.
+    block: optional (x, y, z) tuple of slices selecting a sub-block of the volume
+    dtype: floating point type of the slabs
+    Yields
+    ------
+    (start: int, slab: np.array)
+        start is the index of the first plane of the slab along x and
+        slab has shape (planes, ny, nz) restricted to the selected block,
+        or (nval, planes, ny, nz) for cubes with several values per voxel
+    """
+    with open_cube(file) as cube:
+        _, shape, cube_details = _read_header(cube)
+        nx, ny, nz = shape
+        nval = cube_details['nval']
+        if block is None:
+            block = (slice(None),) * 3
+        bounds = []
+        for sl, n in zip(block, shape):
+            first, last, step = sl.indices(n)
+            if step != 1:
+                raise ValueError("Only contiguous blocks can be streamed")
+            bounds.append((first, max(first, last)))
+        (x0, x1), (y0, y1), (z0, z1) = bounds
+
+        plane = ny * nz * nval
+        planes = max(1, int(max_bytes // (plane * np.dtype(dtype).itemsize)))
+        chunk_size = min(CHUNK_SIZE, max(1, int(max_bytes // 2)))
+        start = 0
+        for values in _iter_blocks(cube, nx * plane, planes * plane, chunk_size, dtype):
+            slab = values.reshape(-1, ny, nz, nval)
+            stop = start + slab.shape[0]
+            if stop > x0 and start < x1:
+                lo, hi = max(start, x0), min(stop, x1)
+                slab = slab[lo - start:hi - start, y0:y1, z0:z1]
+                yield lo, slab[..., 0] if nval == 1 else np.moveaxis(slab, -1, 0)
+            start = stop
+            if start >= x1:
+                break
+
+def open_cube(file, mode='r'):
+    """
+    Open a plain or compressed (.gz, .bz2, .xz) cube file as text.
+    Compressed files are decompressed as they are read.
+    """
+    for extension, compressor in COMPRESSORS.items():
+        if file.endswith(extension):
+            return compressor(file, mode + 't')
+    return open(file, mode)
+
+def write_cube(file, data, meta, comments=None, shape=None):
+    """
+    Write a volume to a cube file, six values per line with every
+    z row starting on a new line as Gaussian does.
+    Parameters
+    ----------
+    file: filename of cube file, compressed if it ends in .gz, .bz2 or .xz
+    data: np.array of shape (nx, ny, nz), or any iterable of (ny, nz) 
+          planes of constant x when shape is given
+    meta: metadata dict with origin, xvec, yvec, zvec and geometry 
+          as returned by cube_to_array
+    comments: the two comment lines of the header
+    shape: (nx, ny, nz) of the grid, by default data.shape
+    """
+    if comments is None:
+        comments = ["moly Gaussian Cube File.", "Written by moly.layers.cube.write_cube"]
+    nx, ny, nz = data.shape if shape is None else shape
+
+    #Character offsets of the line breaks within a plane of constant x
+    z = np.arange(nz)
+    ends = z[((z + 1) % 6 == 0) | (z == nz - 1)]
+    newlines = ((np.arange(ny)[:, None] * nz + ends[None, :] + 1) * 13).ravel()
+
+    #Fallback format string for planes the vectorized formatter cannot handle
+    row = (" %12.5E" * 6 + "\n") * (nz // 6)
+    if nz % 6:
+        row += " %12.5E" * (nz % 6) + "\n"
+    plane = row * ny
+
+    with open_cube(file, 'w') as cube:
+        cube.write(f"{comments[0]}\n{comments[1]}\n")
+        cube.write(_format_line(len(meta["geometry"]), meta["origin"]))
+        for n, vec in zip((nx, ny, nz), (meta["xvec"], meta["yvec"], meta["zvec"])):
+            cube.write(_format_line(n, vec))
+        for atomic_number, position in meta["geometry"]:
+            cube.write(_format_line(atomic_number, position))
+        for x_plane in data:
+            text = _format_values(x_plane, newlines)
+            if text is None:
+                text = plane % tuple(x_plane.ravel().tolist())
+            cube.write(text)
+
+def _format_values(values, newlines):
+    """
+    Format values as " %12.5E" with NumPy arithmetic instead of one
+    string operation per value.
+    Parameters
+    ----------
+    values: np.array of floats
+    newlines: character offsets where line breaks are inserted
+    Returns
+    -------
+    text: str, or None if a value is not finite or needs a three digit exponent
+    """
+    v = np.asarray(values, dtype=float).ravel()
+    if not np.all(np.isfinite(v)):
+        return None
+
+    mag = np.abs(v)
+    nonzero = mag > 0
+    exp = np.zeros(v.size, dtype=np.int64)
+    exp[nonzero] = np.floor(np.log10(mag[nonzero]))
+    mant = mag / 10.0**exp
+    #log10 can land one decade off next to powers of ten
+    exp += mant >= 10
+    exp -= (mant < 1) & nonzero
+    mant = mag / 10.0**exp
+    digits = np.rint(mant * 1e5).astype(np.int64)
+    carry = digits >= 1000000
+    digits[carry] = 100000
+    exp += carry
+    if np.any(np.abs(exp) > 99):
+        return None
+
+    chars = np.empty((v.size, 13), dtype=np.uint8)
+    chars[:, 0] = ord(" ")
+    chars[:, 1] = np.where(np.signbit(v), ord("-"), ord(" "))
+    chars[:, 2] = ord("0") + digits // 100000
+    chars[:, 3] = ord(".")
+    for i in range(5):
+        chars[:, 8 - i] = ord("0") + digits % 10
+        digits //= 10
+    chars[:, 9] = ord("E")
+    chars[:, 10] = np.where(exp < 0, ord("-"), ord("+"))
+    exp = np.abs(exp)
+    chars[:, 11] = ord("0") + exp // 10
+    chars[:, 12] = ord("0") + exp % 10
+
+    return np.insert(chars.ravel(), newlines, ord("\n")).tobytes().decode("ascii")
+
+def _format_line(n, values):
+    """
+    Header line of a cube file: an int followed by floats
+    """
+    return f"{int(n):5d}" + "".join(f" {float(v):11.6f}" for v in values) + "\n"
+
+def cube_name(file):
+    """
+    Path of a cube file without its .cube and compression extensions
+    """
+    for extension in COMPRESSORS:
+        if file.endswith(extension):
+            file = file[:-len(extension)]
+    if file.endswith(".cube"):
+        file = file[:-5]
+    return file
+
+def _read_header(cube):
+    """
+    Read the comment lines, grid and atoms of a cube file
+    Parameters
+    ----------
+    cube: file object of the cube file
+    Returns
+    -------
+    (comments: list<str>, shape: tuple<int>, metadata: dict)
+    """
+    cube_details = {}
+    comments = [cube.readline().rstrip("\n"), cube.readline().rstrip("\n")]
+    natm, origin = _getline(cube)
+    #An optional fifth field gives the number of values per voxel
+    cube_details['origin'] = origin[:3]
+    cube_details['nval'] = int(origin[3]) if len(origin) > 3 else 1
+    nx, cube_details['xvec'] = _getline(cube)
+    ny, cube_details['yvec'] = _getline(cube)
+    nz, cube_details['zvec'] = _getline(cube)
+    cube_details['geometry'] = [_getline(cube) for i in range(abs(natm))]
+
+    #A negative atom count announces a line with the orbital indices
+    if natm < 0:
+        fields = cube.readline().split()
+        while len(fields) < int(fields[0]) + 1:
+            fields.extend(cube.readline().split())
+        cube_details['orbitals'] = [int(field) for field in fields[1:int(fields[0]) + 1]]
+        cube_details['nval'] = len(cube_details['orbitals'])
+
+    return comments, (nx, ny, nz), cube_details
+
+def _iter_chunks(cube, chunk_size=CHUNK_SIZE):
+    """
+    Parse a cube data block in chunks of whole lines, so only a few MB
+    of text are held in memory at any time.
+    Parameters
+    ----------
+    cube: file object positioned at the start of the data block
+    chunk_size: approximate number of characters parsed per chunk
+    Yields
+    ------
+    values: 1D np.array
+    """
+    while True:
+        lines = cube.readlines(chunk_size)
+        if not lines:
+            return
+        yield np.fromstring("".join(lines), sep=" ")
+
+def _read_values(cube, out, chunk_size=CHUNK_SIZE):
+    """
+    Fill a preallocated array with the values of a cube data block.
+    Parameters
+    ----------
+    cube: file object positioned at the start of the data block
+    out: np.array with room for every value in the block, filled in C order
+    chunk_size: approximate number of characters parsed per chunk
+    Returns
+    -------
+    out: np.array
+    """
+    idx = 0
+    target = out if out.ndim == 1 else out.flat
+    for values in _iter_chunks(cube, chunk_size):
+        if idx + values.size > out.size:
+            raise ValueError(f"Cube file holds more than the {out.size} values given by its header")
+        target[idx:idx + values.size] = values
+        idx += values.size
+
+    if idx != out.size:
+        raise ValueError(f"Cube file holds {idx} values but its header expects {out.size}")
+
+    return out
+
+def _iter_blocks(cube, total, block_size, chunk_size=CHUNK_SIZE, dtype=np.float64):
+    """
+    Regroup a cube data block into consecutive arrays of a fixed size
+    Parameters
+    ----------
+    cube: file object positioned at the start of the data block
+    total: number of values given by the header
+    block_size: number of values per yielded array, the last one may be shorter
+    chunk_size: approximate number of characters parsed per chunk
+    dtype: floating point type of the yielded arrays
+    Yields
+    ------
+    values: 1D np.array
+    """
+    buffer = np.empty(min(block_size, total), dtype=dtype)
+    filled = 0
+    idx = 0
+    for values in _iter_chunks(cube, chunk_size):
+        if idx + values.size > total:
+            raise ValueError(f"Cube file holds more than the {total} values given by its header")
+        idx += values.size
+        pos = 0
+        while pos < values.size:
+            take = min(buffer.size - filled, values.size - pos)
+            buffer[filled:filled + take] = values[pos:pos + take]
+            filled += take
+            pos += take
+            if filled == buffer.size:
+                yield buffer
+                buffer = np.empty(min(block_size, total - idx + values.size - pos), dtype=dtype)
+                filled = 0
+
+    if idx != total:
+        raise ValueError(f"Cube file holds {idx} values but its header expects {total}")
+
 def _getline(cube):
     """
     Read a line from cube file where first field is an int
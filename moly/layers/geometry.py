@@ -3,18 +3,27 @@ import plotly.graph_objects as go
 
 from ..figure.colors import *
 from ..figure.layouts import *
-from ..molecule.shapes import get_sphere
+from ..molecule.shapes import get_icosphere, QUALITY
 
+#Marker size in pixels of a sphere of unit radius with style="points"
+POINT_SIZE = 8
 
-def get_sphere_mesh(sphere, sym, xyz, surface):
+#Molecules with more atoms are drawn with style="points" by add_molecule
+POINTS_THRESHOLD = 50000
+
+
+def get_sphere_mesh(sphere, sym, xyz, surface, faces):
 
     lightning = surface_materials[surface]
+    xyz = np.asarray(xyz, dtype=sphere.dtype)
 
     mesh = go.Mesh3d({
             'x': sphere[0] + xyz[0]  , 
             'y': sphere[1] + xyz[1]  , 
             'z': sphere[2] + xyz[2]  , 
-            'alphahull': 0,
+            'i': faces[:, 0],
+            'j': faces[:, 1],
+            'k': faces[:, 2],
             'color'    : colors[sym][0],
             'flatshading' : False,
             "cmin"     :-7,# atrick to get a nice plot (z.min()=-3.31909)
@@ -27,28 +36,152 @@ def get_sphere_mesh(sphere, sym, xyz, surface):
     return mesh
 
 
-def get_atoms(geometry, atomic_numbers, symbols, style, surface):
+def get_radii(atomic_numbers, style):
+    """
+    Sphere radius of every atom for a style
+    """
+    atomic_numbers = np.asarray(atomic_numbers)
+    if style == "ball_and_stick":
+        return atomic_numbers / 30 + 0.6
+    elif style == "tubes":
+        return np.full(atomic_numbers.shape, 0.3)
+    elif style == "spacefilling":
+        return atomic_numbers / 20 + 1.5
+    elif style == "wireframe":
+        return np.full(atomic_numbers.shape, 0.06)
+    else:
+        raise ValueError("Only avaliable styles are \"ball_and_stick\", \"tubes\", \"spacefilling\" and \"wireframe\" ")
+
+
+def get_atoms(geometry, atomic_numbers, symbols, style, surface, dtype=np.float64, quality="medium", bonds=None):
+    #Wireframes are drawn by the bond lines, plus markers for unbonded atoms
+    if style == "wireframe":
+        return get_unbonded_points(geometry, atomic_numbers, symbols, bonds, dtype=dtype)
+
     trace_list = []
-    sphere = np.array(get_sphere())
+    vertices, faces = get_icosphere(QUALITY[quality]["subdivisions"], dtype=dtype)
+    sphere = vertices.T
+    radii = get_radii(atomic_numbers, style)
 
     for atom, xyz in enumerate(geometry):
-        if style is "ball_and_stick":
-            reshaped_sphere = sphere * (atomic_numbers[atom]/30 + 0.6)
-        elif style is "tubes":
-            reshaped_sphere = sphere * 0.3
-        elif style is "spacefilling":
-            reshaped_sphere = sphere * (atomic_numbers[atom]/20 + 1.5)
-        elif style is "wireframe":
-            reshaped_sphere = sphere * 0.06
-        else:
-            raise ValueError("Only avaliable styles are \"ball_and_stick\", \"tubes\", \"spacefilling\" and \"wireframe\" ")
-        mesh = get_sphere_mesh(reshaped_sphere,symbols[atom], xyz, surface)
+        reshaped_sphere = (sphere * radii[atom]).astype(dtype, copy=False)
+        mesh = get_sphere_mesh(reshaped_sphere,symbols[atom], xyz, surface, faces)
         trace_list.append(mesh)
 
     return trace_list
 
 
+def get_atoms_mesh(geometry, atomic_numbers, symbols, style, surface, dtype=np.float64, quality="medium", bonds=None):
+    """
+    All atoms of a molecule as a single Mesh3d trace
+    Parameters
+    ----------
+    geometry: np.array (natoms, 3)
+    atomic_numbers, symbols: atomic numbers and element symbols of the atoms
+    style: str, sets the radius of the spheres
+    surface: str, material of the spheres
+    dtype: floating point type of the vertices
+    quality: "low", "medium" or "high", tessellation of the spheres
+    bonds: None or list of (idx1, idx2), only used by wireframe
+    Returns
+    -------
+    [go.Mesh3d] colored per vertex by element. For wireframe, whose bonds are
+    drawn as lines, a Scatter3d of the atoms without bonds, or nothing
+    """
+    if style == "wireframe":
+        return get_unbonded_points(geometry, atomic_numbers, symbols, bonds, dtype=dtype)
+
+    sphere, faces = get_icosphere(QUALITY[quality]["subdivisions"], dtype=dtype)
+    radii = get_radii(atomic_numbers, style).astype(dtype)
+    geometry = np.asarray(geometry, dtype=dtype)
+    natoms, nvertices = len(geometry), len(sphere)
+
+    #(natoms, nvertices, 3)
+    vertices = radii[:, None, None] * sphere[None] + geometry[:, None, :]
+    vertices = vertices.reshape(-1, 3)
+    faces = (faces[None] + nvertices * np.arange(natoms, dtype=np.int32)[:, None, None]).reshape(-1, 3)
+    index, colorscale, cmax = get_element_colorscale(symbols)
 
+    mesh = go.Mesh3d({
+            'x': vertices[:, 0],
+            'y': vertices[:, 1],
+            'z': vertices[:, 2],
+            'i': faces[:, 0],
+            'j': faces[:, 1],
+            'k': faces[:, 2],
+            'intensity': np.repeat(index, nvertices).astype(np.uint8),
+            'colorscale': colorscale,
+            'cmin': 0,
+            'cmax': cmax,
+            'showscale': False,
+            'flatshading' : False,
+            "lighting" : surface_materials[surface],
+            "lightposition" : {"x":100,
+                               "y":200,
+                               "z":0}     
+    })
 
+    return [mesh]
+
+
+def get_atoms_points(geometry, atomic_numbers, symbols, radii="ball_and_stick", dtype=np.float64):
+    """
+    All atoms of a molecule as the markers of a single Scatter3d trace
+    Parameters
+    ----------
+    geometry: np.array (natoms, 3)
+    atomic_numbers, symbols: atomic numbers and element symbols of the atoms
+    radii: "ball_and_stick" or "spacefilling", style whose radii size the markers
+    dtype: floating point type of the coordinates
+    Returns
+    -------
+    [go.Scatter3d] colored by element
+    """
+    geometry = np.asarray(geometry, dtype=dtype)
+    sizes = get_radii(atomic_numbers, radii) * POINT_SIZE
+    index, colorscale, cmax = get_element_colorscale(symbols)
+
+    points = go.Scatter3d({
+            'x': geometry[:, 0],
+            'y': geometry[:, 1],
+            'z': geometry[:, 2],
+            'mode': "markers",
+            'marker': {"size": sizes.astype(np.float32),
+                       "color": index.astype(np.uint8),
+                       "colorscale": colorscale,
+                       "cmin": 0,
+                       "cmax": cmax,
+                       "opacity": 1.0,
+                       "line": {"width": 0}},
+            'text': symbols,
+            'hoverinfo': "text",
+            'showlegend': False,
+    })
 
-
+    return [points]
+
+
+def get_unbonded_points(geometry, atomic_numbers, symbols, bonds=None, dtype=np.float64):
+    """
+    Atoms that are not part of any bond as markers, so wireframes still show them
+    Parameters
+    ----------
+    geometry: np.array (natoms, 3)
+    atomic_numbers, symbols: atomic numbers and element symbols of the atoms
+    bonds: None or list of (idx1, idx2), every atom is unbonded with None
+    dtype: floating point type of the coordinates
+    Returns
+    -------
+    [go.Scatter3d] colored by element, empty if every atom is bonded
+    """
+    unbonded = np.ones(len(symbols), dtype=bool)
+    if bonds is not None and len(bonds) > 0:
+        unbonded[np.asarray(bonds, dtype=int).ravel()] = False
+    if not unbonded.any():
+        return []
+
+    geometry = np.asarray(geometry).reshape(-1, 3)[unbonded]
+    atomic_numbers = np.asarray(atomic_numbers)[unbonded]
+    symbols = [symbol for symbol, keep in zip(symbols, unbonded) if keep]
+
+    return get_atoms_points(geometry, atomic_numbers, symbols, dtype=dtype)
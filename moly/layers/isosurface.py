@@ -0,0 +1,149 @@
+"""
+
+Isosurface extraction in Python, producing compact Mesh3d traces
+
+"""
+
+import numpy as np
+import plotly.graph_objects as go
+
+from ..figure.layouts import surface_materials
+from .cube import get_cube_range
+
+#Corners of a grid cell and its split into six tetrahedra around the 0-6 diagonal.
+#Every cell is split the same way, so faces of neighbouring cells match.
+CELL_CORNERS = np.array([[0, 0, 0], [1, 0, 0], [1, 1, 0], [0, 1, 0],
+                         [0, 0, 1], [1, 0, 1], [1, 1, 1], [0, 1, 1]])
+TETRAHEDRA = np.array([[0, 5, 1, 6], [0, 1, 2, 6], [0, 2, 3, 6],
+                       [0, 3, 7, 6], [0, 7, 4, 6], [0, 4, 5, 6]])
+
+
+def _tetrahedron_table():
+    """
+    Triangles cutting a tetrahedron for each of the 16 inside/outside cases.
+    Each triangle is given by three edges, each edge by its two local vertices.
+    Unused triangles are filled with -1.
+    """
+    table = np.full((16, 2, 3, 2), -1)
+    for case in range(16):
+        inside = [v for v in range(4) if case >> v & 1]
+        outside = [v for v in range(4) if not case >> v & 1]
+        if len(inside) in (1, 3):
+            odd = inside[0] if len(inside) == 1 else outside[0]
+            table[case, 0] = [(odd, v) for v in range(4) if v != odd]
+        elif len(inside) == 2:
+            (a, b), (c, d) = inside, outside
+            table[case, 0] = [(a, c), (a, d), (b, d)]
+            table[case, 1] = [(a, c), (b, d), (b, c)]
+    return table
+
+TETRAHEDRON_TABLE = _tetrahedron_table()
+
+
+def marching_tetrahedra(cube, level):
+    """
+    Extract the surface where a volume crosses a level
+    Parameters
+    ----------
+    cube: np.array of shape (nx, ny, nz)
+    level: float, voxels above the level are inside the surface
+    Returns
+    -------
+    (vertices: np.array (nvertices, 3) in grid index units,
+     faces: np.array (nfaces, 3) of vertex indices, wound so that
+            normals point from the inside to the outside)
+    """
+    cube = np.asarray(cube)
+    inside = cube > level
+    shape = np.array(cube.shape)
+
+    #Only cells with corners on both sides of the level are visited
+    corners = [inside[x:x + shape[0] - 1, y:y + shape[1] - 1, z:z + shape[2] - 1] for x, y, z in CELL_CORNERS]
+    any_inside = np.logical_or.reduce(corners)
+    all_inside = np.logical_and.reduce(corners)
+    cells = np.argwhere(any_inside & ~all_inside)
+    if len(cells) == 0:
+        return np.zeros((0, 3)), np.zeros((0, 3), dtype=np.int64)
+
+    #Grid points of every tetrahedron of the active cells, (ntetrahedra, 4, 3)
+    points = cells[:, None, None, :] + CELL_CORNERS[TETRAHEDRA][None, :, :, :]
+    points = points.reshape(-1, 4, 3)
+    ids = np.ravel_multi_index(points.transpose(2, 0, 1), cube.shape)
+    cases = (inside.ravel()[ids] << np.arange(4)).sum(axis=1)
+
+    #Triangles as pairs of grid point ids per corner, (ntriangles, 3, 2)
+    edges = []
+    owners = []
+    for slot in range(2):
+        table = TETRAHEDRON_TABLE[cases, slot]
+        valid = table[:, 0, 0] >= 0
+        local = table[valid]
+        rows = np.nonzero(valid)[0]
+        edges.append(np.take_along_axis(ids[rows][:, None, :], local.reshape(len(rows), 1, 6), axis=2).reshape(-1, 3, 2))
+        owners.append(rows)
+    edges = np.concatenate(edges)
+    owners = np.concatenate(owners)
+
+    #Vertices shared by every triangle on the same grid edge
+    low = edges.min(axis=2)
+    high = edges.max(axis=2)
+    keys, faces = np.unique(low * cube.size + high, return_inverse=True)
+    faces = faces.reshape(-1, 3)
+    p, q = keys // cube.size, keys % cube.size
+    vp, vq = cube.ravel()[p], cube.ravel()[q]
+    t = ((level - vp) / (vq - vp))[:, None]
+    p_xyz = np.stack(np.unravel_index(p, cube.shape), axis=1)
+    q_xyz = np.stack(np.unravel_index(q, cube.shape), axis=1)
+    vertices = p_xyz + t * (q_xyz - p_xyz)
+
+    #Wind every triangle so its normal points away from the inside vertices
+    tetra_inside = inside.ravel()[ids[owners]]
+    tetra_points = points[owners]
+    n_inside = tetra_inside.sum(axis=1, keepdims=True)
+    inside_center = (tetra_points * tetra_inside[..., None]).sum(axis=1) / n_inside
+    outside_center = (tetra_points * ~tetra_inside[..., None]).sum(axis=1) / (4 - n_inside)
+    v0, v1, v2 = vertices[faces[:, 0]], vertices[faces[:, 1]], vertices[faces[:, 2]]
+    normals = np.cross(v1 - v0, v2 - v0)
+    flip = np.einsum("ij,ij->i", normals, outside_center - inside_center) < 0
+    faces[flip] = faces[flip][:, ::-1]
+
+    return vertices, faces
+
+def get_cube_mesh(cube, spacing, origin, iso, colorscale, opacity, visible=True):
+    """
+    Mesh3d trace of the +iso and -iso surfaces of a volume, colored by the
+    ends of the colorscale like the Isosurface trace of get_cube_trace
+    Returns
+    -------
+    (trace: go.Mesh3d, min_range: float, max_range: float)
+    """
+    cube = np.asarray(cube)
+
+    positive, positive_faces = marching_tetrahedra(cube, iso)
+    negative, negative_faces = marching_tetrahedra(-cube, iso)
+    vertices = np.concatenate([positive, negative])
+    faces = np.concatenate([positive_faces, negative_faces + len(positive)]).astype(np.int32)
+    intensity = np.concatenate([np.ones(len(positive)), -np.ones(len(negative))]).astype(cube.dtype)
+
+    vertices = (vertices * np.asarray(spacing) + np.asarray(origin)).astype(cube.dtype)
+
+    trace = go.Mesh3d(x = vertices[:, 0],
+                      y = vertices[:, 1],
+                      z = vertices[:, 2],
+                      i = faces[:, 0],
+                      j = faces[:, 1],
+                      k = faces[:, 2],
+                      intensity = intensity,
+                      intensitymode = "vertex",
+                      colorscale = colorscale,
+                      cmin = -1,
+                      cmax = 1,
+                      showscale = False,
+                      visible = visible,
+                      flatshading = False,
+                      lighting = surface_materials["matte"],
+                      opacity = opacity)
+
+    min_range, max_range = get_cube_range(cube.shape, spacing, origin)
+
+    return trace, min_range, max_range
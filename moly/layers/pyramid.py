@@ -0,0 +1,61 @@
+"""
+
+Multi-resolution pyramids of cube volumes
+
+"""
+
+import numpy as np
+
+#Voxels handed to plotly when add_cube picks a level automatically
+VOXEL_BUDGET = 1000000
+
+
+def get_pyramid(cube, spacing, origin, factors=(2, 4, 8)):
+    """
+    Build block-averaged copies of a volume
+    Parameters
+    ----------
+    cube: np.array of shape (nx, ny, nz)
+    spacing: grid spacing along x, y, z
+    origin: position of the first voxel
+    factors: edge length in voxels of the averaged blocks of each coarse level
+    Returns
+    -------
+    pyramid: list<dict> with the factor, cube, spacing and origin of every level,
+             starting with the full resolution volume as factor 1
+    """
+    pyramid = [{"factor": 1, "cube": cube, "spacing": list(spacing), "origin": list(origin)}]
+
+    for factor in factors:
+        #Pad with edge values so every block is complete
+        pad = [(0, -n % factor) for n in cube.shape]
+        padded = np.pad(cube, pad, mode="edge")
+        nx, ny, nz = [n // factor for n in padded.shape]
+        coarse = padded.reshape(nx, factor, ny, factor, nz, factor).mean(axis=(1, 3, 5), dtype=cube.dtype)
+
+        #Each coarse voxel sits at the center of its block
+        pyramid.append({"factor": factor, 
+                        "cube": coarse,
+                        "spacing": [d * factor for d in spacing],
+                        "origin": [o + d * (factor - 1) / 2 for o, d in zip(origin, spacing)]})
+
+    return pyramid
+
+def pick_level(pyramid, max_voxels=VOXEL_BUDGET):
+    """
+    Finest level of a pyramid with at most max_voxels voxels,
+    or the coarsest level if none fits
+    """
+    for level in pyramid:
+        if level["cube"].size <= max_voxels:
+            return level
+    return pyramid[-1]
+
+def get_level(pyramid, factor):
+    """
+    Level of a pyramid with the given block factor
+    """
+    for level in pyramid:
+        if level["factor"] == factor:
+            return level
+    raise ValueError(f"Available resolutions are {[level['factor'] for level in pyramid]}")
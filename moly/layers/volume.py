@@ -0,0 +1,158 @@
+"""
+
+Blockwise arithmetic on cube volumes
+
+"""
+
+import numbers
+
+import numpy as np
+
+from .cache import load_cached, store_cached_slabs
+from .cube import iter_cube, peek_cube, write_cube
+
+#Memory ceiling of a single slab while an expression is evaluated
+SLAB_BYTES = 16 * 2**20
+
+
+class Volume():
+    """
+    Lazy expression over cube files sharing the same grid, e.g. 
+
+        density = Volume.from_cube("Da.cube") - Volume.from_cube("Dt.cube")
+
+    Nothing is read until the expression is evaluated. Evaluation streams 
+    every cube slab by slab along x, so peak memory stays at a few slabs 
+    besides the result. Volumes can be passed to Figure.add_cube and 
+    get_cube_trace like a path or an array.
+    """
+    def __init__(self, op, args, meta, shape):
+
+        self.op = op
+        self.args = args
+        self.meta = meta
+        self.shape = shape
+
+    @classmethod
+    def from_cube(cls, file, cache=None):
+        """
+        Volume of a cube file. With a cache the volume is read from its
+        memory-mapped binary copy, otherwise the text is streamed.
+        """
+        header = peek_cube(file)
+        if header["nval"] != 1:
+            raise ValueError("Volume expressions need cubes with a single value per voxel")
+        meta = {key: header[key] for key in ("origin", "xvec", "yvec", "zvec", "geometry", "nval")}
+        return cls("cube", (file, cache), meta, header["shape"])
+
+    #Operators
+
+    def _combine(self, op, other):
+        if isinstance(other, Volume):
+            self._check_grid(other)
+        elif not isinstance(other, numbers.Number):
+            return NotImplemented
+        return Volume(op, (self, other), self.meta, self.shape)
+
+    def _rcombine(self, op, other):
+        if not isinstance(other, numbers.Number):
+            return NotImplemented
+        return Volume(op, (other, self), self.meta, self.shape)
+
+    def __add__(self, other): return self._combine(np.add, other)
+    def __radd__(self, other): return self._rcombine(np.add, other)
+    def __sub__(self, other): return self._combine(np.subtract, other)
+    def __rsub__(self, other): return self._rcombine(np.subtract, other)
+    def __mul__(self, other): return self._combine(np.multiply, other)
+    def __rmul__(self, other): return self._rcombine(np.multiply, other)
+    def __truediv__(self, other): return self._combine(np.true_divide, other)
+    def __neg__(self): return Volume(np.negative, (self,), self.meta, self.shape)
+    def __abs__(self): return Volume(np.abs, (self,), self.meta, self.shape)
+
+    def _check_grid(self, other):
+        if self.shape != other.shape:
+            raise ValueError(f"Volumes have different grids {self.shape} and {other.shape}")
+        for key in ("origin", "xvec", "yvec", "zvec"):
+            if not np.allclose(self.meta[key], other.meta[key]):
+                raise ValueError(f"Volumes have different grid {key}")
+
+    #Evaluation
+
+    def iter_slabs(self, max_bytes=SLAB_BYTES, dtype=np.float64):
+        """
+        Evaluate the expression slab by slab along x
+        Yields
+        ------
+        (start: int, slab: np.array of shape (planes, ny, nz))
+        """
+        nx, ny, nz = self.shape
+        planes = max(1, int(max_bytes // (ny * nz * np.dtype(dtype).itemsize)))
+        return self._slabs(planes, dtype)
+
+    def _slabs(self, planes, dtype):
+        if self.op == "cube":
+            file, cache = self.args
+            cached = load_cached(file, cache) if cache else None
+            if cached is not None and cached[0].dtype == dtype:
+                for start in range(0, self.shape[0], planes):
+                    yield start, np.asarray(cached[0][start:start + planes])
+                return
+
+            max_bytes = planes * self.shape[1] * self.shape[2] * np.dtype(dtype).itemsize
+            slabs = iter_cube(file, max_bytes=max_bytes, dtype=dtype)
+            if cache:
+                #Fill the cache on the way, the volume is never held in memory
+                header = peek_cube(file)
+                details = {key: value for key, value in header.items() if key not in ("natoms", "shape", "comments")}
+                slabs = store_cached_slabs(file, cache, slabs, self.shape, dtype, details)
+            yield from slabs
+            return
+
+        streams = [arg._slabs(planes, dtype) if isinstance(arg, Volume) else None for arg in self.args]
+        for start in range(0, self.shape[0], planes):
+            values = [arg if stream is None else next(stream)[1] for arg, stream in zip(self.args, streams)]
+            yield start, self.op(*values).astype(dtype, copy=False)
+
+    def to_array(self, max_bytes=SLAB_BYTES, dtype=np.float64):
+        """
+        Evaluate the expression into an array of shape (nx, ny, nz)
+        """
+        out = np.empty(self.shape, dtype=dtype)
+        for start, slab in self.iter_slabs(max_bytes, dtype):
+            out[start:start + slab.shape[0]] = slab
+        return out
+
+    def __array__(self, dtype=None, copy=None):
+        return self.to_array(dtype=np.float64 if dtype is None else dtype)
+
+    def to_cube(self, file, max_bytes=SLAB_BYTES, comments=None):
+        """
+        Evaluate the expression straight into a cube file
+        """
+        planes = (plane for _, slab in self.iter_slabs(max_bytes) for plane in slab)
+        write_cube(file, planes, self.meta, comments=comments, shape=self.shape)
+
+    def max(self, max_bytes=SLAB_BYTES):
+        """
+        Largest value of the expression
+        """
+        return max(float(slab.max()) for _, slab in self.iter_slabs(max_bytes))
+
+    def min(self, max_bytes=SLAB_BYTES):
+        """
+        Smallest value of the expression
+        """
+        return min(float(slab.min()) for _, slab in self.iter_slabs(max_bytes))
+
+
+def maximum(a, b):
+    """
+    Voxelwise maximum of two volumes, or of a volume and a number
+    """
+    return a._combine(np.maximum, b) if isinstance(a, Volume) else b._rcombine(np.maximum, a)
+
+def minimum(a, b):
+    """
+    Voxelwise minimum of two volumes, or of a volume and a number
+    """
+    return a._combine(np.minimum, b) if isinstance(a, Volume) else b._rcombine(np.minimum, a)
@@ -0,0 +1,65 @@
+"""
+Guess bonds of large molecules
+
+"""
+
+import numpy as np
+import qcelemental as qcel
+from qcelemental.exceptions import NotAnElementError
+
+
+def guess_connectivity(symbols, geometry, threshold=1.2):
+    """
+    Bonds between atoms closer than the sum of their covalent radii times
+    threshold, as qcel.molutil.guess_connectivity, on a grid of cells so
+    the cost grows linearly with the number of atoms
+    Parameters
+    ----------
+    symbols: list<str> element symbols
+    geometry: np.array (natoms, 3) in bohr
+    threshold: float, safety factor of the covalent radii
+    Returns
+    -------
+    list of (idx1, idx2) with idx1 < idx2, sorted
+    """
+    geometry = np.asarray(geometry, dtype=float).reshape(-1, 3)
+    natoms = len(geometry)
+    if natoms < 2:
+        return []
+
+    radii = {}
+    for symbol in set(symbols):
+        try:
+            radii[symbol] = qcel.covalentradii.get(symbol, missing=1.8)
+        except NotAnElementError:
+            radii[symbol] = 1.8
+    radii = np.array([radii[symbol] for symbol in symbols])
+
+    #Bonded atoms are at most one cell apart
+    size = 2 * radii.max() * threshold
+    cells = np.floor((geometry - geometry.min(axis=0)) / size).astype(np.int64)
+    shape = cells.max(axis=0) + 3
+    keys = np.ravel_multi_index((cells + 1).T, shape)
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+
+    pairs = []
+    for offset in np.ndindex(3, 3, 3):
+        neighbours = np.ravel_multi_index((cells + offset).T, shape)
+        start = np.searchsorted(sorted_keys, neighbours, side="left")
+        counts = np.searchsorted(sorted_keys, neighbours, side="right") - start
+
+        #Every atom against every atom of the neighbouring cell
+        first = np.repeat(np.arange(natoms), counts)
+        second = order[np.repeat(start - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())]
+        keep = first < second
+        first, second = first[keep], second[keep]
+
+        distances = np.linalg.norm(geometry[first] - geometry[second], axis=1)
+        bonded = distances < (radii[first] + radii[second]) * threshold
+        pairs.append(np.stack([first[bonded], second[bonded]], -1))
+
+    pairs = np.concatenate(pairs)
+    pairs = pairs[np.lexsort((pairs[:, 1], pairs[:, 0]))]
+
+    return [(int(idx1), int(idx2)) for idx1, idx2 in pairs]
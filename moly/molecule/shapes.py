@@ -5,6 +5,19 @@ Produce basic shapes for molecules
 
 import numpy as np
 
+#Icosphere subdivisions and cylinder sides of each quality preset
+QUALITY = {"low": {"subdivisions": 1, "sides": 8},
+           "medium": {"subdivisions": 2, "sides": 16},
+           "high": {"subdivisions": 3, "sides": 32}}
+
+#Vertices of all atoms and bonds of a molecule with quality="auto"
+VERTEX_BUDGET = 500000
+
+ICOSAHEDRON_FACES = [[0, 11, 5], [0, 5, 1], [0, 1, 7], [0, 7, 10], [0, 10, 11],
+                     [1, 5, 9], [5, 11, 4], [11, 10, 2], [10, 7, 6], [7, 1, 8],
+                     [3, 9, 4], [3, 4, 2], [3, 2, 6], [3, 6, 8], [3, 8, 9],
+                     [4, 9, 5], [2, 4, 11], [6, 2, 10], [8, 6, 7], [9, 8, 1]]
+
 def rotation_matrix(vec1, vec2):
     """ Find the rotation matrix that aligns vec1 to vec2
     :param vec1: A 3d "source" vector
@@ -20,6 +33,36 @@ def rotation_matrix(vec1, vec2):
     return rotation_matrix
 
 
+def rotation_matrices(vectors):
+    """
+    Rotations aligning the z axis to each of a stack of vectors
+    Parameters
+    ----------
+    vectors: np.array (n, 3)
+    Returns
+    -------
+    np.array (n, 3, 3)
+        Vectors parallel to z give the identity, antiparallel ones a half 
+        turn around x, null vectors the identity
+    """
+    vectors = np.asarray(vectors, dtype=float)
+    norms = np.linalg.norm(vectors, axis=1)
+    b = np.divide(vectors, norms[:, None], out=np.tile([0.0, 0.0, 1.0], (len(vectors), 1)), where=norms[:, None] > 0)
+
+    #Rodrigues formula for z x b, where (1 - c) / s**2 = 1 / (1 + c)
+    c = b[:, 2]
+    kmat = np.zeros((len(b), 3, 3))
+    kmat[:, 0, 2] = b[:, 0]
+    kmat[:, 1, 2] = b[:, 1]
+    kmat[:, 2, 0] = -b[:, 0]
+    kmat[:, 2, 1] = -b[:, 1]
+    antiparallel = c < -1 + 1e-12
+    scale = 1 / np.where(antiparallel, 1.0, 1 + c)
+    matrices = np.eye(3) + kmat + np.einsum("nij,njk->nik", kmat, kmat) * scale[:, None, None]
+    matrices[antiparallel] = np.diag([1.0, -1.0, -1.0])
+
+    return matrices
+
 def get_single_cylinder(radius, points=100):
     phi = np.linspace(0, 2*np.pi, points)
     x   = radius * np.cos(phi)
@@ -98,6 +141,87 @@ def get_sphere(r=1.0, points=20):
     
     return [xsphere,ysphere,zsphere]
 
+def pick_quality(natoms, ncylinders, max_vertices=VERTEX_BUDGET):
+    """
+    Finest quality preset whose spheres and cylinders fit in a vertex budget
+    Parameters
+    ----------
+    natoms: int, spheres in the scene
+    ncylinders: int, bond cylinders in the scene, two for heteronuclear bonds
+    max_vertices: int, vertex budget
+    Returns
+    -------
+    quality: str, "low" if no preset fits
+    """
+    for quality in ["high", "medium", "low"]:
+        preset = QUALITY[quality]
+        vertices = natoms * (10 * 4 ** preset["subdivisions"] + 2) + ncylinders * 2 * preset["sides"]
+        if vertices <= max_vertices:
+            return quality
+
+    return "low"
+
+def get_icosphere(subdivisions=2, dtype=np.float64):
+    """
+    Triangulated unit sphere from a subdivided icosahedron
+    Parameters
+    ----------
+    subdivisions: int, every subdivision splits each triangle in four
+    dtype: floating point type of the vertices
+    Returns
+    -------
+    (vertices: np.array (nvertices, 3), faces: np.array (nfaces, 3) of vertex indices)
+        10 * 4**subdivisions + 2 evenly spread vertices, faces oriented outwards
+    """
+    t = (1 + np.sqrt(5)) / 2
+    vertices = np.array([[-1, t, 0], [1, t, 0], [-1, -t, 0], [1, -t, 0],
+                         [0, -1, t], [0, 1, t], [0, -1, -t], [0, 1, -t],
+                         [t, 0, -1], [t, 0, 1], [-t, 0, -1], [-t, 0, 1]])
+    vertices /= np.linalg.norm(vertices, axis=1)[:, None]
+    faces = np.array(ICOSAHEDRON_FACES)
+
+    for _ in range(subdivisions):
+        #Every edge is shared by two faces and gets a single midpoint
+        edges = np.sort(np.concatenate([faces[:, [0, 1]], faces[:, [1, 2]], faces[:, [2, 0]]]), axis=1)
+        edges, inverse = np.unique(edges, axis=0, return_inverse=True)
+        midpoints = vertices[edges].sum(axis=1)
+        midpoints /= np.linalg.norm(midpoints, axis=1)[:, None]
+
+        m01, m12, m20 = (len(vertices) + inverse.reshape(3, -1))
+        a, b, c = faces.T
+        faces = np.concatenate([np.stack([a, m01, m20], -1), np.stack([b, m12, m01], -1),
+                                np.stack([c, m20, m12], -1), np.stack([m01, m12, m20], -1)])
+        vertices = np.concatenate([vertices, midpoints])
+
+    return vertices.astype(dtype), faces.astype(np.int32)
+
+def get_cylinder_template(points=32, dtype=np.float64):
+    """
+    Triangulated cylinder of unit radius from z=0 to z=1, with shared vertices
+    Parameters
+    ----------
+    points: int, vertices around each of the two circles
+    dtype: floating point type of the vertices
+    Returns
+    -------
+    (vertices: np.array (2*points, 3), faces: np.array (nfaces, 3) of vertex indices)
+        Sides and caps, oriented outwards
+    """
+    phi = np.arange(points) * 2 * np.pi / points
+    circle = np.stack([np.cos(phi), np.sin(phi)], -1)
+    vertices = np.concatenate([np.column_stack([circle, np.zeros(points)]),
+                               np.column_stack([circle, np.ones(points)])]).astype(dtype)
+
+    k = np.arange(points)
+    after = (k + 1) % points
+    sides = np.concatenate([np.stack([k, after, k + points], -1), 
+                            np.stack([after, after + points, k + points], -1)])
+    fan = np.arange(1, points - 1)
+    bottom = np.stack([np.zeros_like(fan), fan + 1, fan], -1)
+    top = np.stack([np.full_like(fan, points), fan + points, fan + points + 1], -1)
+
+    return vertices, np.concatenate([sides, bottom, top]).astype(np.int32)
+
 def get_atoms_spheres(symbols, atomic_numbers, cube=False):
 
     spheres = []
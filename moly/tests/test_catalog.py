@@ -0,0 +1,46 @@
+"""
+Tests for the cube header catalog in moly.layers.catalog
+"""
+
+import os
+import shutil
+
+import pytest
+
+from moly.layers.catalog import CubeCatalog, parse_comment, CATALOG_FILE
+
+data_dir = os.path.dirname(os.path.abspath(__file__))
+
+
+@pytest.fixture()
+def cube_dir(tmp_path):
+    for name in ["Da.cube", "Dt.cube"]:
+        shutil.copy(os.path.join(data_dir, name), str(tmp_path))
+    return str(tmp_path)
+
+
+def test_parse_comment():
+    details = parse_comment("Property: Da [e/a0^3]. Isocontour range for 85% of the density: (0.0318175,0).")
+    assert details["property"] == "Da"
+    assert details["isocontour_percent"] == 85.0
+    assert details["isocontour_range"] == [0.0318175, 0.0]
+    assert parse_comment("Written by hand")["property"] is None
+
+def test_catalog_entries(cube_dir):
+    catalog = CubeCatalog(cube_dir)
+    assert len(catalog) == 2
+    assert os.path.exists(os.path.join(cube_dir, CATALOG_FILE))
+    entry = catalog.query(name="Da*")[0]
+    assert entry["shape"] == (23, 17, 20)
+    assert entry["spacing"] == [0.5, 0.5, 0.5]
+    assert entry["property"] == "Da"
+    assert catalog.files(property="Dt") == [os.path.join(cube_dir, "Dt.cube")]
+    assert catalog.files(where=lambda entry: entry["natoms"] > 3) == []
+
+def test_catalog_reload_and_update(cube_dir):
+    CubeCatalog(cube_dir)
+    os.remove(os.path.join(cube_dir, "Dt.cube"))
+    shutil.copy(os.path.join(data_dir, "Da.cube"), os.path.join(cube_dir, "Db.cube"))
+    catalog = CubeCatalog(cube_dir)
+    assert [os.path.basename(f) for f in catalog.files()] == ["Da.cube", "Db.cube"]
+    assert CubeCatalog(cube_dir, update=False).get(catalog.files()[0])["geometry"][0][0] == 1
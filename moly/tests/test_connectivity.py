@@ -0,0 +1,19 @@
+"""
+Tests for the bond guessing in moly.molecule.connectivity
+"""
+
+import numpy as np
+import qcelemental as qcel
+
+from moly.molecule.connectivity import guess_connectivity
+
+
+def test_guess_connectivity():
+    rng = np.random.default_rng(0)
+    geometry = rng.uniform(0, 12, size=(200, 3))
+    symbols = list(rng.choice(["C", "H", "O", "Fe"], 200))
+    expected = [(int(i), int(j)) for i, j in qcel.molutil.guess_connectivity(symbols, geometry)]
+    assert guess_connectivity(symbols, geometry) == expected
+
+def test_guess_connectivity_single_atom():
+    assert guess_connectivity(["He"], [[0.0, 0.0, 0.0]]) == []
@@ -0,0 +1,237 @@
+"""
+Tests for the cube file readers in moly.layers.cube
+"""
+
+import bz2
+import gzip
+import lzma
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+from moly.layers.cube import cube_to_array, cube_to_molecule, peek_cube, iter_cube, get_cubes, write_cube, crop_cube
+
+data_dir = os.path.dirname(os.path.abspath(__file__))
+da_cube = os.path.join(data_dir, "Da.cube")
+dt_cube = os.path.join(data_dir, "Dt.cube")
+
+
+@pytest.fixture()
+def cube_dir(tmp_path):
+    for cube_file in [dt_cube, da_cube]:
+        shutil.copy(cube_file, str(tmp_path))
+    return str(tmp_path)
+
+
+def test_cube_to_array_shape():
+    cube, meta = cube_to_array(da_cube)
+    assert cube.shape == (23, 17, 20)
+    assert meta["origin"] == [-5.5, -4.0, -4.304267]
+    assert len(meta["geometry"]) == 3
+    assert cube[0, 0, 0] == pytest.approx(7.60446E-11)
+
+def test_cube_to_array_truncated(tmp_path):
+    with open(da_cube) as f:
+        lines = f.readlines()
+    truncated = tmp_path / "truncated.cube"
+    truncated.write_text("".join(lines[:-1]))
+    with pytest.raises(ValueError):
+        cube_to_array(str(truncated))
+
+def test_cube_to_molecule():
+    geometry, symbols, atomic_numbers, spacing, origin, cube = cube_to_molecule(da_cube)
+    assert geometry.shape == (3, 3)
+    assert list(symbols) == ["H", "O", "H"]
+    assert list(atomic_numbers) == [1, 8, 1]
+    assert spacing == [0.5, 0.5, 0.5]
+    assert np.allclose(geometry[1], [0.0, 0.0, -0.128539])
+
+def test_cube_cache_directory(tmp_path):
+    cube, meta = cube_to_array(da_cube, cache=str(tmp_path))
+    cached, cached_meta = cube_to_array(da_cube, cache=str(tmp_path))
+    assert isinstance(cached, np.memmap)
+    assert np.array_equal(cube, cached)
+    assert cached_meta == meta
+
+def test_cube_cache_sidecar_invalidated(tmp_path):
+    copy = str(tmp_path / "Da.cube")
+    shutil.copy(da_cube, copy)
+    cube_to_array(copy, cache=True)
+    assert os.path.exists(copy + ".npy")
+    stat = os.stat(copy)
+    os.utime(copy, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    cube, _ = cube_to_array(copy, cache=True)
+    assert not isinstance(cube, np.memmap)
+
+def test_peek_cube():
+    header = peek_cube(da_cube)
+    _, meta = cube_to_array(da_cube)
+    assert header["natoms"] == 3
+    assert header["shape"] == (23, 17, 20)
+    assert header["geometry"] == meta["geometry"]
+    assert header["comments"][0] == "Psi4 Gaussian Cube File."
+
+def test_iter_cube_slabs():
+    cube, _ = cube_to_array(da_cube)
+    plane = 17 * 20 * 8
+    slabs = list(iter_cube(da_cube, max_bytes=3 * plane))
+    assert [start for start, _ in slabs] == list(range(0, 23, 3))
+    assert max(slab.nbytes for _, slab in slabs) <= 3 * plane
+    assert np.array_equal(np.concatenate([slab for _, slab in slabs]), cube)
+
+def test_iter_cube_block():
+    cube, _ = cube_to_array(da_cube)
+    block = (slice(5, 12), slice(2, 9), slice(None, 4))
+    slabs = list(iter_cube(da_cube, max_bytes=1, block=block))
+    assert slabs[0][0] == 5
+    assert np.array_equal(np.concatenate([slab for _, slab in slabs]), cube[block])
+
+def test_get_cubes_sorted(cube_dir):
+    cubes, meta = get_cubes(cube_dir)
+    assert [os.path.basename(m["name"]) for m in meta] == ["Da", "Dt"]
+    assert all(m["parse_time"] >= 0 for m in meta)
+
+def test_get_cubes_workers(cube_dir):
+    serial, serial_meta = get_cubes(cube_dir)
+    parallel, parallel_meta = get_cubes(cube_dir, workers=2)
+    assert [m["name"] for m in parallel_meta] == [m["name"] for m in serial_meta]
+    for a, b in zip(serial, parallel):
+        assert np.array_equal(a, b)
+
+@pytest.mark.parametrize("extension, compressor", [(".gz", gzip), (".bz2", bz2), (".xz", lzma)])
+def test_compressed_cube(tmp_path, extension, compressor):
+    compressed = str(tmp_path / ("Da.cube" + extension))
+    with open(da_cube, "rb") as f, compressor.open(compressed, "wb") as out:
+        out.write(f.read())
+    cube, meta = cube_to_array(da_cube)
+    compressed_cube, compressed_meta = cube_to_array(compressed)
+    assert np.array_equal(cube, compressed_cube)
+    assert compressed_meta == meta
+    assert peek_cube(compressed)["shape"] == cube.shape
+
+def test_get_cubes_compressed(cube_dir):
+    with open(da_cube, "rb") as f, gzip.open(os.path.join(cube_dir, "Dz.cube.gz"), "wb") as out:
+        out.write(f.read())
+    cubes, meta = get_cubes(cube_dir)
+    assert [os.path.basename(m["name"]) for m in meta] == ["Da", "Dt", "Dz"]
+    assert np.array_equal(cubes[0], cubes[2])
+
+@pytest.mark.parametrize("name", ["Da.cube", "Da.cube.gz"])
+def test_write_cube_roundtrip(tmp_path, name):
+    cube, meta = cube_to_array(da_cube)
+    written = str(tmp_path / name)
+    write_cube(written, cube, meta)
+    written_cube, written_meta = cube_to_array(written)
+    assert np.allclose(written_cube, cube, rtol=1e-5, atol=0)
+    assert written_meta["origin"] == meta["origin"]
+    assert [atom[0] for atom in written_meta["geometry"]] == [1, 8, 1]
+
+def test_write_cube_format(tmp_path):
+    #Second plane needs a three digit exponent and takes the fallback path
+    values = np.array([[0.0, -0.0, 1e-5, 9.999995e-6, -1.0, 123.456, 7.60446E-11],
+                       [1e-120, 1.0, 2.0, 3.0, 4.0, 5.0, 6.0]]).reshape(2, 1, 7)
+    meta = {"origin": [0.0, 0.0, 0.0], "xvec": [0.1, 0.0, 0.0], "yvec": [0.0, 0.1, 0.0], 
+            "zvec": [0.0, 0.0, 0.1], "geometry": []}
+    written = tmp_path / "values.cube"
+    write_cube(str(written), values, meta)
+    lines = written.read_text().splitlines()[6:]
+    assert len(lines) == 4
+    for x_plane, (first, second) in zip(values, [lines[:2], lines[2:]]):
+        assert first + second == "".join(" %12.5E" % v for v in x_plane.ravel())
+        assert len(second) == 13
+
+def test_cube_to_array_float32():
+    cube, _ = cube_to_array(da_cube)
+    cube32, _ = cube_to_array(da_cube, dtype=np.float32)
+    assert cube32.dtype == np.float32
+    assert np.allclose(cube32, cube, rtol=1e-6)
+    slabs = [slab for _, slab in iter_cube(da_cube, dtype=np.float32)]
+    assert slabs[0].dtype == np.float32
+
+def _write_multi_cube(path, volumes, orbitals=None):
+    """Interleave volumes in the Gaussian multi-orbital (or NVal) layout"""
+    _, meta = cube_to_array(da_cube)
+    natm = len(meta["geometry"])
+    with open(path, "w") as f:
+        f.write("Multi value cube\nTest\n")
+        if orbitals is None:
+            f.write("%5d %11.6f %11.6f %11.6f %4d\n" % (natm, *meta["origin"], len(volumes)))
+        else:
+            f.write("%5d %11.6f %11.6f %11.6f\n" % (-natm, *meta["origin"]))
+        for n, vec in zip(volumes[0].shape, [meta["xvec"], meta["yvec"], meta["zvec"]]):
+            f.write("%5d %11.6f %11.6f %11.6f\n" % (n, *vec))
+        for z, position in meta["geometry"]:
+            f.write("%5d %11.6f %11.6f %11.6f %11.6f\n" % (z, *position))
+        if orbitals is not None:
+            f.write(" ".join(str(i) for i in [len(orbitals)] + orbitals) + "\n")
+        values = np.stack(volumes, axis=-1).ravel()
+        for start in range(0, values.size, 6):
+            f.write("".join(" %12.5E" % v for v in values[start:start + 6]) + "\n")
+
+@pytest.mark.parametrize("orbitals", [[5, 6], None])
+def test_multi_value_cube(tmp_path, orbitals):
+    da, _ = cube_to_array(da_cube)
+    dt, _ = cube_to_array(dt_cube)
+    path = str(tmp_path / "orbitals.cube")
+    _write_multi_cube(path, [da, dt], orbitals)
+
+    cube, meta = cube_to_array(path)
+    assert cube.shape == (2, 23, 17, 20)
+    assert meta["nval"] == 2
+    assert meta.get("orbitals") == orbitals
+    assert len(meta["geometry"]) == 3
+    assert np.allclose(cube[0], da) and np.allclose(cube[1], dt)
+
+    slabs = [slab for _, slab in iter_cube(path, max_bytes=1)]
+    assert slabs[0].shape == (2, 1, 17, 20)
+    assert np.allclose(np.concatenate(slabs, axis=1), cube)
+
+    cubes, details = get_cubes(path)
+    assert len(cubes) == 2
+    assert details[0]["label"] == ("orbitals MO 5" if orbitals else "orbitals Value 1")
+
+def test_crop_cube():
+    cube = np.zeros((10, 12, 14))
+    cube[3:5, 4, 6:9] = 1.0
+    cube[4, 5, 7] = -1.0
+    cropped, origin = crop_cube(cube, [0.5, 1.0, 2.0], [1.0, 0.0, -1.0], 0.5)
+    assert cropped.shape == (4, 4, 5)
+    assert origin == [2.0, 3.0, 9.0]
+    assert np.abs(cropped).sum() == np.abs(cube).sum()
+
+def test_crop_cube_empty():
+    cube = np.zeros((4, 4, 4))
+    cropped, origin = crop_cube(cube, [1.0] * 3, [0.0] * 3, 0.5)
+    assert cropped.shape == cube.shape
+    assert origin == [0.0] * 3
+
+def test_get_cube_coordinates():
+    from moly.layers.cube import get_cube_coordinates
+    x, y, z = get_cube_coordinates((3, 4, 5), (0.5, 1.0, 2.0), (1.0, 0.0, -1.0), "<f8")
+    x_r, y_r, z_r = np.mgrid[:3, :4, :5]
+    assert np.array_equal(x, (x_r * 0.5 + 1.0).ravel())
+    assert np.array_equal(y, (y_r * 1.0).ravel())
+    assert np.array_equal(z, (z_r * 2.0 - 1.0).ravel())
+    assert x.dtype == np.float64
+    assert get_cube_coordinates((3, 4, 5), (0.5, 1.0, 2.0), (1.0, 0.0, -1.0), np.float32)[0].dtype == np.float32
+
+def test_get_isocontour_range():
+    from moly.layers.cube import get_isocontour_range
+    values = np.array([0.05, -4.0, 3.0, -0.5, 1.0, 0.1, -0.2, 0.0])
+    #Cumulative |values| 4, 7, 8, 8.5, ... out of 8.85
+    assert get_isocontour_range(values, 0.85) == [1.0, -4.0]
+    assert get_isocontour_range(values, 0.95) == [1.0, -0.5]
+    assert get_isocontour_range(values, 0.4) == [0.0, -4.0]
+
+def test_resolve_iso():
+    from moly.layers.cube import resolve_iso
+    cube, _ = cube_to_array(da_cube)
+    auto = resolve_iso(cube, "auto")
+    assert auto == resolve_iso(cube, ("fraction", 0.85))
+    assert resolve_iso(cube, ("fraction", 0.5)) > auto
+    assert np.abs(cube)[np.abs(cube) >= auto].sum() >= 0.85 * np.abs(cube).sum()
+    assert resolve_iso(cube, [0.1, 0.2]) == [0.1, 0.2]
+    with pytest.raises(ValueError):
+        resolve_iso(cube, "max")
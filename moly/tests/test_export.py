@@ -0,0 +1,52 @@
+"""
+Tests for the compact figure serialization in moly.figure.export
+"""
+
+import base64
+import os
+
+import numpy as np
+import pytest
+
+import moly
+from moly.figure.export import encode_array, compact_figure
+
+data_dir = os.path.dirname(os.path.abspath(__file__))
+
+
+@pytest.mark.parametrize("values, dtype", [(np.arange(300), "u2"), 
+                                           (np.arange(10), "u1"),
+                                           (np.arange(-5, 5), "i4"),
+                                           (np.linspace(0, 1, 7), "f4")])
+def test_encode_array_dtype(values, dtype):
+    spec = encode_array(values)
+    assert spec["dtype"] == dtype
+    decoded = np.frombuffer(base64.b64decode(spec["bdata"]), dtype="<" + dtype)
+    assert np.allclose(decoded, values)
+
+@pytest.mark.parametrize("values", [np.array([0, 2**40]), np.array([-1, 2**40]), np.array([-2**40, 1])])
+def test_encode_array_int64(values):
+    #No typed array of plotly.js holds them, nor may they wrap around
+    assert encode_array(values) is None
+    figure = compact_figure(moly.Figure().fig.add_scatter(x=np.repeat(values, 10)), min_size=1)
+    assert figure["data"][0]["x"] == np.repeat(values, 10).tolist()
+
+def test_encode_array_precision():
+    spec = encode_array(np.array([0.123456, 1.987654]), precision=2)
+    decoded = np.frombuffer(base64.b64decode(spec["bdata"]), dtype="<f4")
+    assert np.allclose(decoded, [0.12, 1.99])
+
+def test_compact_figure(tmp_path):
+    fig = moly.Figure()
+    fig.add_cube(os.path.join(data_dir, "Da.cube"), iso=0.03)
+    figure = compact_figure(fig.fig)
+    surface = figure["data"][-1]
+    assert surface["value"]["dtype"] == "f4"
+    assert surface["x"]["dtype"] == "f4"
+    assert surface["isomax"] == 0.03
+
+    path = str(tmp_path / "figure.html")
+    fig.write_html(path)
+    compact_size = os.path.getsize(path)
+    fig.write_html(path, compact=False)
+    assert compact_size < os.path.getsize(path)
@@ -1,3 +1,6 @@
+import shutil
+
+import numpy as np
 import pytest
 import moly
 
@@ -24,6 +27,10 @@ def test_add_molecule_from_data_wireframe(he_dimer):
     fig = moly.Figure()
     mol = moly.Molecule.from_data(he_dimer)
     fig.add_molecule("he2", mol, style="wireframe")
+    #Without bonds, both atoms are still drawn as markers
+    assert len(fig.fig.data) == 1
+    assert fig.fig.data[0].mode == "markers"
+    assert len(fig.fig.data[0].x) == 2
 
 def test_add_molecule_from_data_spacefilling(he_dimer):
     fig = moly.Figure()
@@ -35,6 +42,111 @@ def test_add_molecule_from_data_tubes(he_dimer):
     mol = moly.Molecule.from_data(he_dimer)
     fig.add_molecule("he2", mol,  style="tubes")
 
+def test_add_molecule_merged():
+    water = moly.Molecule.from_file("water.xyz")
+    fig = moly.Figure()
+    fig.add_molecule("water", water)
+    assert len(fig.fig.data) == 2
+    bonds, atoms = fig.fig.data
+    #Small molecules get the finest tessellation
+    assert len(atoms.x) == 3 * 642
+    assert atoms.i.max() < len(atoms.x)
+    assert sorted(set(atoms.intensity)) == [0, 1]
+    fig = moly.Figure()
+    fig.add_molecule("water", water, merge=False)
+    assert len(fig.fig.data) == 4 + 3
+
+@pytest.mark.parametrize("quality, vertices", [("low", 42), ("medium", 162), ("high", 642)])
+def test_figure_quality(quality, vertices):
+    water = moly.Molecule.from_file("water.xyz")
+    fig = moly.Figure(quality=quality)
+    fig.add_molecule("water", water)
+    assert len(fig.fig.data[-1].x) == 3 * vertices
+
+@pytest.mark.parametrize("merge", [True, False])
+@pytest.mark.parametrize("z", [1.4, -1.4])
+def test_add_molecule_bond_along_z(merge, z):
+    h2 = moly.Molecule(symbols=["H", "H"], geometry=[0.0, 0.0, 0.0, 0.0, 0.0, z])
+    fig = moly.Figure()
+    fig.add_molecule("h2", h2, merge=merge)
+    bond = fig.fig.data[0]
+    assert np.all(np.isfinite(bond.x))
+    assert bond.z.min() == pytest.approx(min(z, 0.0))
+    assert bond.z.max() == pytest.approx(max(z, 0.0))
+
+def test_add_molecule_points():
+    water = moly.Molecule.from_file("water.xyz")
+    fig = moly.Figure()
+    fig.add_molecule("water", water, style="points")
+    assert len(fig.fig.data) == 1
+    points = fig.fig.data[0]
+    assert points.mode == "markers"
+    assert len(points.x) == 3
+    #Oxygen is larger than hydrogen
+    assert points.marker.size[1] > points.marker.size[0]
+    fig = moly.Figure()
+    fig.add_molecule("water", water, max_atoms=2, point_bonds=True)
+    lines, points = fig.fig.data
+    assert points.mode == "markers"
+    assert len(lines.x) == 2 * 3
+    assert np.isnan(lines.x[2])
+
+def test_add_molecule_points_spacefilling():
+    from moly.layers.geometry import get_radii, POINT_SIZE
+    water = moly.Molecule.from_file("water.xyz")
+    fig = moly.Figure()
+    fig.add_molecule("water", water, style="spacefilling", max_atoms=2)
+    points = fig.fig.data[-1]
+    assert points.mode == "markers"
+    assert np.allclose(points.marker.size, get_radii(water.atomic_numbers, "spacefilling") * POINT_SIZE)
+
+@pytest.mark.parametrize("merge", [True, False])
+def test_add_molecule_wireframe_lines(merge):
+    water = moly.Molecule.from_file("water.xyz")
+    fig = moly.Figure()
+    fig.add_molecule("water", water, style="wireframe", merge=merge)
+    assert len(fig.fig.data) == 1
+    lines = fig.fig.data[0]
+    assert lines.mode == "lines"
+    assert len(lines.x) == 2 * 6
+    #Each half of a bond takes the color of its atom
+    assert list(lines.line.color[:6]) == [0, 0, 0, 1, 1, 1]
+    assert lines.x[1] == pytest.approx((water.geometry[0, 0] + water.geometry[1, 0]) / 2)
+
+def test_add_molecule_wireframe_unbonded_atom():
+    salt = moly.Molecule(symbols=["H", "H", "Na"], geometry=[0.0, 0.0, 0.0, 0.0, 0.0, 1.4, 10.0, 0.0, 0.0])
+    fig = moly.Figure()
+    fig.add_molecule("salt", salt, style="wireframe")
+    lines, points = fig.fig.data
+    assert lines.mode == "lines"
+    assert points.mode == "markers"
+    assert list(points.text) == ["Na"]
+    assert points.x[0] == pytest.approx(10.0)
+
+@pytest.mark.parametrize("style", ["ball_and_stick", "points", "wireframe"])
+def test_add_molecule_homonuclear_colors(style):
+    h2 = moly.Molecule(symbols=["H", "H"], geometry=[0.0, 0.0, 0.0, 0.0, 0.0, 1.4])
+    fig = moly.Figure()
+    fig.add_molecule("h2", h2, style=style)
+    for trace in fig.fig.data:
+        colorscale = trace.marker.colorscale if style == "points" else (
+                     trace.line.colorscale if style == "wireframe" else trace.colorscale)
+        assert colorscale[0][0] == 0.0
+        assert colorscale[-1][0] == 1.0
+        assert {color for _, color in colorscale} == {moly.figure.colors.colors["H"][0]}
+
+def test_add_molecule_quality_override():
+    water = moly.Molecule.from_file("water.xyz")
+    fig = moly.Figure(quality="high")
+    fig.add_molecule("water", water, quality="low")
+    assert len(fig.fig.data[-1].x) == 3 * 42
+    fig.add_molecule("water", water, quality="auto", max_vertices=1000)
+    assert len(fig.fig.data[-1].x) == 3 * 162
+
+def test_figure_quality_invalid():
+    with pytest.raises(ValueError):
+        moly.Figure(quality="ultra")
+
 def test_add_molecule_from_file():
     fig = moly.Figure()
     mol = moly.Molecule.from_file("water.xyz")
@@ -50,6 +162,73 @@ def test_add_cube_slider():
     fig = moly.Figure()
     fig.add_cube("Da.cube", iso=[0.01, 0.1], colorscale="rdbu", opacity=0.2)
 
+def test_add_cube_cache(tmp_path):
+    fig = moly.Figure(cache=str(tmp_path))
+    fig.add_cube("Da.cube", iso=0.03)
+    fig.add_cube("Da.cube", iso=0.03)
+
+def test_add_cube_float32():
+    fig = moly.Figure(dtype=np.float32)
+    fig.add_cube("Da.cube", iso=0.03)
+    for trace in fig.fig.data:
+        assert trace.x.dtype == np.float32
+    assert fig.fig.data[-1].value.dtype == np.float32
+
+def test_add_cube_crop():
+    fig = moly.Figure()
+    fig.add_cube("Da.cube", iso=0.03, crop=True)
+    cropped = fig.fig.data[-1]
+    assert cropped.value.size < 23 * 17 * 20
+    assert cropped.x.min() > -5.5
+
+def test_add_cube_restyle_slider():
+    isos = [0.01 * (i + 1) for i in range(20)]
+    fig = moly.Figure()
+    fig.add_cube("Da.cube", iso=isos, slider="restyle")
+    surfaces = [trace for trace in fig.fig.data if trace.type == "isosurface"]
+    assert len(surfaces) == 1
+    steps = fig.fig.layout.sliders[0].steps
+    assert len(steps) == 20
+    assert steps[-1].args[0] == {"isomin": [-isos[-1]], "isomax": [isos[-1]]}
+    assert list(steps[-1].args[1]) == [len(fig.fig.data) - 1]
+
+def test_add_cube_auto_iso():
+    fig = moly.Figure()
+    fig.add_cube("Da.cube", iso="auto")
+    assert fig.fig.data[-1].isomax > 0
+    assert fig.fig.data[-1].isomin == -fig.fig.data[-1].isomax
+
+def test_add_cube_resolution():
+    fig = moly.Figure()
+    fig.add_cube("Da.cube", iso=[0.01, 0.03], resolution="auto", max_voxels=1000)
+    assert fig.fig.data[-1].value.size == 6 * 5 * 5
+    fig.set_cube_resolution(1)
+    assert fig.fig.data[-2].value.size == 23 * 17 * 20
+    assert fig.fig.data[-1].value.size == 23 * 17 * 20
+
+def test_add_cubes_orbital_file(tmp_path):
+    from moly.tests.test_cube import _write_multi_cube
+    da, _ = moly.layers.cube.cube_to_array("Da.cube")
+    path = str(tmp_path / "orbitals.cube")
+    _write_multi_cube(path, [da, -da, 2 * da], [4, 5, 6])
+    fig = moly.Figure()
+    fig.add_cubes(directory=path, iso=0.01)
+    labels = [button.label for button in fig.fig.layout.updatemenus[0].buttons]
+    assert labels == ["Geometry", "orbitals MO 4", "orbitals MO 5", "orbitals MO 6"]
+
+def test_add_cube_volume():
+    from moly.layers.volume import Volume
+    fig = moly.Figure()
+    fig.add_cube(Volume.from_cube("Da.cube") - Volume.from_cube("Dt.cube"), iso=0.01)
+
+def test_add_cube_mesh():
+    fig = moly.Figure()
+    fig.add_cube("Da.cube", iso=[0.01, 0.03], engine="mesh", resolution=2)
+    assert fig.fig.data[-1].type == "mesh3d"
+    fig.set_cube_resolution(1)
+    with pytest.raises(ValueError):
+        fig.add_cube("Da.cube", engine="voxels")
+
 def test_add_cubes():
     fig = moly.Figure()
     fig.add_cubes(directory='test_files', colorscale="portland", iso=0.1)
@@ -58,3 +237,84 @@ def test_add_cubes():
 
 
 
+
+def test_add_cubes_lazy(tmp_path):
+    pytest.importorskip("anywidget")
+    for cube_file in ["Da.cube", "Dt.cube"]:
+        shutil.copy(cube_file, str(tmp_path))
+    fig = moly.Figure()
+    fig.add_cubes(directory=str(tmp_path), iso=0.01, lazy=True, max_bytes=1)
+    placeholders = fig.fig.data[-2:]
+    assert all(trace.value is None for trace in placeholders)
+
+    #Clicking a button sends its update args back from the browser
+    def click(button):
+        style, layout = fig.fig.layout.updatemenus[0].buttons[button].args
+        fig.fig._js2py_update = {"style_data": style, "style_traces": None,
+                                 "layout_data": layout, "source_view_id": "view"}
+
+    click(1)
+    assert placeholders[0].value is not None
+    #Values and coordinates count towards max_bytes
+    assert fig.lazy_cubes.loaded[0] == 4 * placeholders[0].value.nbytes
+
+    click(2)
+    assert placeholders[0].value is None
+    assert placeholders[1].value is not None
+
+def test_add_cubes_lazy_orbitals(tmp_path, monkeypatch):
+    pytest.importorskip("anywidget")
+    from moly.layers.cube import cube_to_array
+    from moly.tests.test_cube import _write_multi_cube
+    da, dt = cube_to_array("Da.cube")[0], cube_to_array("Dt.cube")[0]
+    path = str(tmp_path / "orbitals.cube")
+    _write_multi_cube(path, [da, dt], [5, 6])
+    fig = moly.Figure()
+    fig.add_cubes(directory=path, iso=0.01, lazy=True)
+    #One placeholder per orbital
+    placeholders = fig.fig.data[-2:]
+    assert [button.label for button in fig.fig.layout.updatemenus[0].buttons[1:]] == ["orbitals MO 5", "orbitals MO 6"]
+    fig.lazy_cubes.load(1)
+    assert np.allclose(placeholders[1].value, dt.ravel())
+    #The file is only parsed once for all of its orbitals
+    def fail(*args, **kwargs):
+        raise AssertionError("orbitals.cube parsed again")
+    monkeypatch.setattr(moly.figure.lazy, "cube_to_array", fail)
+    fig.lazy_cubes.load(0)
+    assert np.allclose(placeholders[0].value, da.ravel())
+    #Without room in max_bytes the parsed file is dropped
+    fig.lazy_cubes.max_bytes = 1
+    fig.lazy_cubes.evict()
+    assert fig.lazy_cubes.parsed == {}
+
+def test_add_cubes_orbitals_timings(tmp_path, capsys):
+    from moly.layers.cube import cube_to_array
+    from moly.tests.test_cube import _write_multi_cube
+    da = cube_to_array("Da.cube")[0]
+    path = str(tmp_path / "orbitals.cube")
+    _write_multi_cube(path, [da, da, da], [4, 5, 6])
+    fig = moly.Figure()
+    fig.add_cubes(directory=path, iso=0.01, timings=True)
+    assert len(fig.fig.layout.updatemenus[0].buttons) == 4
+    lines = capsys.readouterr().out.splitlines()
+    assert len(lines) == 2
+    assert lines[0].startswith(f"{path}: ")
+    assert lines[1].startswith("Parsed 1 cube files")
+
+def test_add_cube_orbitals(tmp_path):
+    from moly.layers.cube import cube_to_array
+    from moly.tests.test_cube import _write_multi_cube
+    da = cube_to_array("Da.cube")[0]
+    path = str(tmp_path / "orbitals.cube")
+    _write_multi_cube(path, [da, da])
+    with pytest.raises(ValueError):
+        moly.Figure().add_cube(path)
+
+def test_add_cubes_catalog(tmp_path):
+    from moly.layers.catalog import CubeCatalog
+    for cube_file in ["Da.cube", "Dt.cube"]:
+        shutil.copy(cube_file, str(tmp_path))
+    catalog = CubeCatalog(str(tmp_path))
+    fig = moly.Figure()
+    fig.add_cubes(directory=str(tmp_path), iso=0.01, files=catalog.files(property="Dt"))
+    assert len(fig.fig.layout.updatemenus[0].buttons) == 2
@@ -0,0 +1,45 @@
+"""
+Tests for the Python isosurface extraction in moly.layers.isosurface
+"""
+
+import os
+from collections import Counter
+
+import numpy as np
+
+from moly.layers.cube import cube_to_array
+from moly.layers.isosurface import marching_tetrahedra, get_cube_mesh
+
+data_dir = os.path.dirname(os.path.abspath(__file__))
+
+
+def sphere_volume(n=30):
+    x, y, z = np.ogrid[-1:1:n * 1j, -1:1:n * 1j, -1:1:n * 1j]
+    return 1 - (x**2 + y**2 + z**2), 2 / (n - 1)
+
+def test_marching_tetrahedra_sphere():
+    volume, h = sphere_volume()
+    vertices, faces = marching_tetrahedra(volume, 0.5)
+    points = vertices * h - 1
+    radius = np.linalg.norm(points, axis=1)
+    assert np.allclose(radius, np.sqrt(0.5), atol=5e-3)
+
+    #Closed surface: every directed edge appears exactly once
+    directed = np.concatenate([faces[:, [0, 1]], faces[:, [1, 2]], faces[:, [2, 0]]])
+    assert set(Counter(map(tuple, directed)).values()) == {1}
+
+    #Normals point outwards
+    normals = np.cross(points[faces[:, 1]] - points[faces[:, 0]], points[faces[:, 2]] - points[faces[:, 0]])
+    assert np.all(np.einsum("ij,ij->i", normals, points[faces].mean(axis=1)) > 0)
+
+def test_marching_tetrahedra_empty():
+    vertices, faces = marching_tetrahedra(np.zeros((4, 4, 4)), 0.5)
+    assert vertices.shape == (0, 3) and faces.shape == (0, 3)
+
+def test_get_cube_mesh():
+    cube, meta = cube_to_array(os.path.join(data_dir, "Da.cube"))
+    trace, min_range, max_range = get_cube_mesh(cube, [0.5, 0.5, 0.5], meta["origin"], 0.01, "rdbu", 0.2)
+    assert len(trace.i) > 0
+    assert trace.x.size < cube.size
+    assert trace.i.max() < trace.x.size
+    assert min_range == -5.5
@@ -0,0 +1,31 @@
+"""
+Tests for the volume pyramids in moly.layers.pyramid
+"""
+
+import numpy as np
+import pytest
+
+from moly.layers.pyramid import get_pyramid, pick_level, get_level
+
+
+def test_get_pyramid_shapes():
+    cube = np.random.rand(23, 17, 20)
+    pyramid = get_pyramid(cube, [0.5, 0.5, 0.5], [0.0, 0.0, 0.0])
+    assert [level["factor"] for level in pyramid] == [1, 2, 4, 8]
+    assert [level["cube"].shape for level in pyramid] == [(23, 17, 20), (12, 9, 10), (6, 5, 5), (3, 3, 3)]
+    assert pyramid[2]["spacing"] == [2.0, 2.0, 2.0]
+    assert pyramid[2]["origin"] == [0.75, 0.75, 0.75]
+
+def test_get_pyramid_block_average():
+    cube = np.arange(64, dtype=np.float32).reshape(4, 4, 4)
+    coarse = get_level(get_pyramid(cube, [1, 1, 1], [0, 0, 0], factors=(2,)), 2)["cube"]
+    assert coarse.dtype == np.float32
+    assert coarse[0, 0, 0] == cube[:2, :2, :2].mean()
+
+def test_pick_level():
+    pyramid = get_pyramid(np.zeros((16, 16, 16)), [1, 1, 1], [0, 0, 0])
+    assert pick_level(pyramid, 16**3)["factor"] == 1
+    assert pick_level(pyramid, 1000)["factor"] == 2
+    assert pick_level(pyramid, 1)["factor"] == 8
+    with pytest.raises(ValueError):
+        get_level(pyramid, 3)
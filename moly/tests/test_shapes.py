@@ -0,0 +1,57 @@
+"""
+Tests for the mesh primitives in moly.molecule.shapes
+"""
+
+import numpy as np
+import pytest
+
+from moly.molecule.shapes import get_cylinder_template, get_icosphere, pick_quality
+from moly.molecule.shapes import rotation_matrix, rotation_matrices
+
+
+def _edge_counts(faces):
+    edges = np.sort(np.concatenate([faces[:, [0, 1]], faces[:, [1, 2]], faces[:, [2, 0]]]), axis=1)
+    _, counts = np.unique(edges, axis=0, return_counts=True)
+    return counts
+
+def _volume(vertices, faces):
+    a, b, c = vertices[faces[:, 0]], vertices[faces[:, 1]], vertices[faces[:, 2]]
+    return np.einsum("ij,ij->i", a, np.cross(b, c)).sum() / 6
+
+@pytest.mark.parametrize("template, volume", [(get_icosphere, 4 / 3 * np.pi),
+                                              (get_cylinder_template, np.pi)])
+def test_template_closed_outwards(template, volume):
+    vertices, faces = template()
+    assert faces.max() == len(vertices) - 1
+    assert np.all(_edge_counts(faces) == 2)
+    assert _volume(vertices, faces) == pytest.approx(volume, rel=0.05)
+
+def test_template_shared_vertices():
+    vertices, _ = get_cylinder_template(points=16)
+    assert len(vertices) == 32
+
+@pytest.mark.parametrize("subdivisions", [0, 1, 3])
+def test_icosphere(subdivisions):
+    vertices, faces = get_icosphere(subdivisions)
+    assert len(vertices) == 10 * 4 ** subdivisions + 2
+    assert len(faces) == 20 * 4 ** subdivisions
+    assert np.allclose(np.linalg.norm(vertices, axis=1), 1.0)
+
+def test_pick_quality():
+    assert pick_quality(3, 2) == "high"
+    assert pick_quality(1000, 2000, max_vertices=500000) == "medium"
+    assert pick_quality(10000, 20000, max_vertices=500000) == "low"
+
+def test_rotation_matrices():
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(20, 3))
+    matrices = rotation_matrices(vectors)
+    for vector, matrix in zip(vectors, matrices):
+        assert np.allclose(matrix, rotation_matrix(np.array([0, 0, 1]), vector))
+
+@pytest.mark.parametrize("vector", [[0, 0, 2.5], [0, 0, -2.5], [0, 0, -1e-9]])
+def test_rotation_matrices_degenerate(vector):
+    matrix = rotation_matrices([vector])[0]
+    assert np.allclose(matrix @ matrix.T, np.eye(3))
+    assert np.linalg.det(matrix) == pytest.approx(1.0)
+    assert np.allclose(matrix @ [0, 0, 1], np.array(vector) / np.linalg.norm(vector))
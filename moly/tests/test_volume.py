@@ -0,0 +1,69 @@
+"""
+Tests for the blockwise volume expressions in moly.layers.volume
+"""
+
+import os
+
+import numpy as np
+import pytest
+
+from moly.layers.cube import cube_to_array, get_cube_trace
+from moly.layers.volume import Volume, maximum
+
+data_dir = os.path.dirname(os.path.abspath(__file__))
+da_cube = os.path.join(data_dir, "Da.cube")
+dt_cube = os.path.join(data_dir, "Dt.cube")
+
+
+@pytest.fixture()
+def arrays():
+    return cube_to_array(da_cube)[0], cube_to_array(dt_cube)[0]
+
+
+def test_volume_arithmetic(arrays):
+    da, dt = arrays
+    a, b = Volume.from_cube(da_cube), Volume.from_cube(dt_cube)
+    assert np.allclose((a - b).to_array(max_bytes=1), da - dt)
+    assert np.allclose((2 * a + b / 2).to_array(), 2 * da + dt / 2)
+    assert np.allclose(abs(a - b).to_array(), np.abs(da - dt))
+    assert np.allclose(maximum(a, b).to_array(), np.maximum(da, dt))
+    assert np.allclose(maximum(0.01, -a).to_array(), np.maximum(0.01, -da))
+    assert (a - b).max() == pytest.approx((da - dt).max())
+
+def test_volume_cache(tmp_path, arrays):
+    da, dt = arrays
+    a = Volume.from_cube(da_cube, cache=str(tmp_path))
+    b = Volume.from_cube(dt_cube)
+    assert np.allclose(np.asarray(a - b), da - dt)
+    assert np.allclose((a - b).to_array(dtype=np.float32), da - dt, atol=1e-6)
+
+def test_volume_cache_streamed(tmp_path, arrays):
+    from moly.layers.cache import load_cached
+    da, _ = arrays
+    a = Volume.from_cube(da_cube, cache=str(tmp_path))
+    #An interrupted evaluation leaves no entry behind
+    next(a.iter_slabs(max_bytes=1))
+    assert load_cached(da_cube, str(tmp_path)) is None
+    #A complete one fills the cache while streaming, later ones read it
+    assert np.allclose(a.to_array(max_bytes=1), da)
+    cached, details = load_cached(da_cube, str(tmp_path))
+    assert np.array_equal(cached, da)
+    assert details == cube_to_array(da_cube)[1]
+    assert np.allclose(a.to_array(), da)
+
+def test_volume_to_cube_and_trace(tmp_path, arrays):
+    da, dt = arrays
+    difference = Volume.from_cube(da_cube) - Volume.from_cube(dt_cube)
+    path = str(tmp_path / "difference.cube")
+    difference.to_cube(path, max_bytes=1)
+    assert np.allclose(cube_to_array(path)[0], da - dt, rtol=1e-5, atol=1e-12)
+    trace, _, _ = get_cube_trace(difference, [0.5, 0.5, 0.5], [0, 0, 0], 0.01, "rdbu", 0.2)
+    assert trace.value.size == da.size
+
+def test_volume_grid_mismatch(tmp_path):
+    from moly.layers.cube import write_cube
+    da, meta = cube_to_array(da_cube)
+    path = str(tmp_path / "small.cube")
+    write_cube(path, da[:10], meta)
+    with pytest.raises(ValueError):
+        Volume.from_cube(da_cube) - Volume.from_cube(path)